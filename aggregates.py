@@ -0,0 +1,100 @@
+"""
+Incrementally maintained dashboard aggregates
+"""
+
+from typing import Dict, List, Any, Callable
+
+
+class DashboardAggregates:
+    """Totals and chart data for the dashboard, updated as user data changes
+
+    ``data_version`` is the user data version the aggregates were built from;
+    ``version`` increases with every incremental change and keys the cached
+    chart frames, so an unchanged dashboard costs O(1) to render.
+    """
+
+    def __init__(self, data_version: int = 0):
+        self.data_version = data_version
+        self.version = 0
+        self.goal_counts: Dict[str, int] = {}
+        self.total_affirmations = 0
+        self.days = set()
+        self.completed_days = set()
+        self.moods: Dict[str, int] = {}
+        self._frames = {}
+
+    @classmethod
+    def from_user_data(cls, user_data: Dict[str, Any], data_version: int = 0) -> 'DashboardAggregates':
+        aggregates = cls(data_version)
+        for area, goals in user_data.get('goals', {}).items():
+            if isinstance(goals, list):
+                aggregates.update_goals(area, goals)
+        aggregates.update_affirmations(user_data.get('affirmations', []))
+        for day, reflection in user_data.get('daily_reflections', {}).items():
+            aggregates.update_day(day, reflection)
+        return aggregates
+
+    # Incremental updates
+
+    def update_goals(self, area: str, goals: List[Dict[str, Any]]):
+        if self.goal_counts.get(area, 0) != len(goals):
+            self.goal_counts[area] = len(goals)
+            self.version += 1
+
+    def update_affirmations(self, affirmations: List[Dict[str, Any]]):
+        if self.total_affirmations != len(affirmations):
+            self.total_affirmations = len(affirmations)
+            self.version += 1
+
+    def update_day(self, day: str, reflection: Dict[str, Any]):
+        changed = day not in self.days
+        self.days.add(day)
+        if reflection.get('completed') and day not in self.completed_days:
+            self.completed_days.add(day)
+            changed = True
+        if 'mood_index' in reflection and self.moods.get(day) != reflection['mood_index']:
+            self.moods[day] = reflection['mood_index']
+            changed = True
+        if changed:
+            self.version += 1
+
+    # Dashboard values
+
+    @property
+    def total_goals(self) -> int:
+        return sum(self.goal_counts.values())
+
+    @property
+    def reflection_days(self) -> int:
+        return len(self.days)
+
+    @property
+    def completion_rate(self) -> float:
+        if not self.days:
+            return 0
+        return len(self.completed_days) / len(self.days) * 100
+
+    def _frame(self, name: str, build: Callable):
+        """Return a cached frame, rebuilding it only if the aggregates changed since"""
+        cached = self._frames.get(name)
+        if cached is None or cached[0] != self.version:
+            cached = self._frames[name] = (self.version, build())
+        return cached[1]
+
+    def goal_frame(self):
+        """Goal count per life area (areas without goals omitted)"""
+        def build():
+            import pandas as pd
+            counts = {area: count for area, count in self.goal_counts.items() if count}
+            return pd.DataFrame({'Goal Count': list(counts.values())},
+                                index=pd.Index(list(counts), name='Life Area'))
+        return self._frame('goals', build)
+
+    def mood_frame(self):
+        """Mood index per day, oldest first"""
+        def build():
+            import pandas as pd
+            days = sorted(self.moods)
+            return pd.DataFrame({'Mood': [self.moods[day] for day in days]},
+                                index=pd.DatetimeIndex(pd.to_datetime(days), name='Date'))
+        return self._frame('moods', build)
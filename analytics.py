@@ -0,0 +1,166 @@
+"""
+Adherence analytics over the columnar rating store
+
+A day counts as *followed* when its rating is at least ADHERENCE_THRESHOLD.
+Days marked "not relevant" neither extend nor break a streak; days with a
+low rating or without a rating break it.
+"""
+
+from typing import Dict, List, Any, Optional
+
+from ratings import RatingStore, NO_RATING, day_ordinal
+
+# Minimum rating for a day to count as followed
+ADHERENCE_THRESHOLD = 7
+
+# Moving-average windows shown on the dashboard, in days
+MOVING_AVERAGE_WINDOWS = (7, 30)
+
+# Days considered for the per-area adherence rates
+AREA_WINDOW = 30
+
+# Streak step per day
+FOLLOWED, SKIPPED, BROKEN = 1, 0, -1
+
+
+def day_outcome(rating: int, masked: int) -> int:
+    """Classify one stored day as FOLLOWED, SKIPPED or BROKEN"""
+    if masked:
+        return SKIPPED if rating != NO_RATING else BROKEN
+    return FOLLOWED if rating >= ADHERENCE_THRESHOLD else BROKEN
+
+
+def streaks(values, mask):
+    """Return (current, longest) streaks of followed days for one series (NumPy arrays)"""
+    import numpy as np
+    counted = ~(mask & (values != NO_RATING))
+    followed = (values >= ADHERENCE_THRESHOLD) & ~mask
+    followed = followed[counted]
+    if not len(followed):
+        return 0, 0
+    # Each break starts a new run; the run length is the number of followed days in it
+    runs = np.bincount(np.cumsum(~followed), weights=followed)
+    return int(runs[-1]), int(runs.max())
+
+
+def moving_average(values, mask, window: int):
+    """Mean rating over the trailing ``window`` days, ignoring masked days (NaN where none)"""
+    import numpy as np
+    valid = ~mask
+    sums = np.concatenate(([0], np.cumsum(np.where(valid, values, 0), dtype=np.int64)))
+    counts = np.concatenate(([0], np.cumsum(valid, dtype=np.int64)))
+    start = np.maximum(np.arange(1, len(values) + 1) - window, 0)
+    end = np.arange(1, len(values) + 1)
+    window_counts = counts[end] - counts[start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_counts > 0, (sums[end] - sums[start]) / window_counts, np.nan)
+
+
+class AffirmationStats:
+    """Streak state of one affirmation, advanced one day at a time"""
+
+    __slots__ = ('last_index', 'current', 'longest', 'previous_current', 'previous_longest')
+
+    def __init__(self):
+        self.last_index = -1
+        self.current = self.longest = 0
+        # State before the last processed day, so re-rating that day is O(1)
+        self.previous_current = self.previous_longest = 0
+
+    def advance(self, outcome: int):
+        self.previous_current, self.previous_longest = self.current, self.longest
+        self.last_index += 1
+        if outcome == FOLLOWED:
+            self.current += 1
+            self.longest = max(self.longest, self.current)
+        elif outcome == BROKEN:
+            self.current = 0
+
+
+class AdherenceAnalytics:
+    """Streaks, moving averages and per-area adherence, kept current as days are saved"""
+
+    def __init__(self, store: RatingStore):
+        self.store = store
+        self.stats: Dict[str, AffirmationStats] = {}
+        for key in store.series:
+            self._rebuild(key)
+
+    def _rebuild(self, key: str):
+        """Recompute one affirmation over its whole series (vectorized)"""
+        values, mask = self.store.to_numpy(key)
+        stats = AffirmationStats()
+        if len(values) > 1:
+            stats.current, stats.longest = streaks(values[:-1], mask[:-1])
+            stats.last_index = len(values) - 2
+        # The last day goes through advance() so it can be re-rated cheaply
+        if len(values):
+            stats.advance(day_outcome(values[-1], mask[-1]))
+        self.stats[key] = stats
+
+    def record_day(self, day: str):
+        """Update after the store recorded ``day``; O(1) per affirmation for today's ratings"""
+        index = day_ordinal(day) - self.store.start
+        for key, series in self.store.series.items():
+            stats = self.stats.get(key)
+            if stats is None or index < stats.last_index or len(series) - 1 > index:
+                self._rebuild(key)
+                continue
+            if index == stats.last_index:
+                # Re-rating the latest day: roll back to the state before it
+                stats.current, stats.longest = stats.previous_current, stats.previous_longest
+                stats.last_index -= 1
+            while stats.last_index < index:
+                position = stats.last_index + 1
+                stats.advance(day_outcome(series.values[position], series.mask[position]))
+
+    def latest_average(self, key: str, window: int) -> Optional[float]:
+        """Mean rating over the last ``window`` days, or None if none were rated"""
+        series = self.store.series[key]
+        ratings = [value for value, masked in zip(series.values[-window:], series.mask[-window:]) if not masked]
+        return sum(ratings) / len(ratings) if ratings else None
+
+    def adherence_rate(self, key: str, window: int = AREA_WINDOW) -> Optional[float]:
+        """Share of relevant days in the last ``window`` that were followed"""
+        series = self.store.series[key]
+        outcomes = [day_outcome(value, masked) for value, masked in
+                    zip(series.values[-window:], series.mask[-window:])]
+        counted = [outcome for outcome in outcomes if outcome != SKIPPED]
+        return counted.count(FOLLOWED) / len(counted) if counted else None
+
+    def summary(self, affirmations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """One row per affirmation: streaks and moving averages"""
+        rows = []
+        for affirmation in affirmations:
+            key = affirmation['id']
+            if key not in self.stats:
+                continue
+            row = {
+                'Affirmation': affirmation['text'],
+                'Current streak': self.stats[key].current,
+                'Longest streak': self.stats[key].longest,
+            }
+            for window in MOVING_AVERAGE_WINDOWS:
+                row[f'{window}-day avg'] = self.latest_average(key, window)
+            rows.append(row)
+        return rows
+
+    def area_adherence(self, affirmations: List[Dict[str, Any]], window: int = AREA_WINDOW) -> Dict[str, float]:
+        """Mean adherence rate (0-100) of the affirmations in each life area"""
+        rates = {}
+        for affirmation in affirmations:
+            area = affirmation.get('area')
+            if not area or affirmation['id'] not in self.store.series:
+                continue
+            rate = self.adherence_rate(affirmation['id'], window)
+            if rate is not None:
+                rates.setdefault(area, []).append(rate)
+        return {area: sum(values) / len(values) * 100 for area, values in rates.items()}
+
+    def moving_average_frame(self, key: str):
+        """Date-indexed frame of the 7- and 30-day moving averages of one affirmation"""
+        import pandas as pd
+        values, mask = self.store.to_numpy(key)
+        index = pd.DatetimeIndex(self.store.days())
+        return pd.DataFrame({f'{window}-day avg': moving_average(values, mask, window)
+                             for window in MOVING_AVERAGE_WINDOWS}, index=index)
@@ -0,0 +1,41 @@
+"""
+Static assets linked by URL instead of being sent with every rerun
+
+Stylesheets and images live in static/ and are served by Streamlit's component file
+server (the app static folder serves .css as text/plain, which browsers
+refuse as a stylesheet). Each URL carries a hash of the file contents, so a
+browser fetches a file once and an edited file gets a new URL.
+"""
+
+import hashlib
+import os
+from functools import lru_cache
+
+import streamlit.components.v1 as components
+
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+# Registering the directory as a component makes Streamlit serve it under component/<name>/
+_assets = components.declare_component("assets", path=ASSET_DIR)
+ASSET_ROUTE = "component/assets.assets"
+
+
+@lru_cache(maxsize=None)
+def fingerprint(name: str) -> str:
+    """Short content hash of one asset (computed once per process)"""
+    with open(os.path.join(ASSET_DIR, name), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def asset_url(name: str) -> str:
+    return f"{ASSET_ROUTE}/{name}?v={fingerprint(name)}"
+
+
+def stylesheet_tag(name: str) -> str:
+    """<link> tag for a stylesheet in static/"""
+    return f'<link rel="stylesheet" href="{asset_url(name)}">'
+
+
+def image_tag(name: str, alt: str = "") -> str:
+    """<img> tag for an image in static/, sized to its container"""
+    return f'<img src="{asset_url(name)}" alt="{alt}" style="width: 100%; height: auto;">'
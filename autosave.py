@@ -0,0 +1,169 @@
+"""
+Write-behind autosave of user data
+
+The Streamlit script thread only encodes the rows a ChangeTracker marked dirty
+and hands them to an AutosaveWorker; a background thread writes them to the
+storage backend once edits pause for ``debounce`` seconds, once ``batch_size``
+rows are pending, or when the session ends.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+import weakref
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+import metrics
+import storage
+from storage import RowKey
+
+logger = logging.getLogger(__name__)
+
+# Seconds without new edits before pending rows are written
+DEBOUNCE_SECONDS = 2.0
+
+# Pending rows that trigger a write without waiting for the debounce
+BATCH_SIZE = 50
+
+# Longest a row may stay pending while edits keep coming
+MAX_DELAY_SECONDS = 10.0
+
+# Shortest wait for new edits, so a zero debounce does not spin the worker
+MIN_POLL_SECONDS = 0.05
+
+# Workers still running at interpreter exit get a final flush
+_workers = weakref.WeakSet()
+
+
+class AutosaveWorker:
+    """Background writer of one user's dirty rows"""
+
+    def __init__(self, backend: storage.RowStorageBackend, user_id: str,
+                 debounce: float = DEBOUNCE_SECONDS, batch_size: int = BATCH_SIZE,
+                 max_delay: float = MAX_DELAY_SECONDS, alive: Optional[Callable[[], bool]] = None):
+        self.backend = backend
+        self.user_id = user_id
+        self.debounce = debounce
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        # Returns False once the owning session is gone
+        self.alive = alive
+        self._queue = queue.Queue()
+        # section -> ({row key: JSON or None}, [row groups]), merged from submissions
+        self._pending: Dict[str, Tuple[Dict[RowKey, Optional[str]], List[RowKey]]] = {}
+        self._first_pending = None
+        self._last_submit = None
+        # (section, seconds) of the latest background write, for the debug panel
+        self.last_write = None
+        self._flushed = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=f"autosave-{user_id}", daemon=True)
+        self._thread.start()
+        _workers.add(self)
+
+    def submit(self, data: Dict[str, Any], keys: List[RowKey], flush: bool = False):
+        """Queue the current value of the rows ``keys`` (from the script thread, never blocks on I/O)"""
+        by_section = {}
+        for key in keys:
+            by_section.setdefault(storage.TABLE_SECTION[key[0]], []).append(key)
+        batch = {section: storage.encode_changes(section, data[section], section_keys)
+                 for section, section_keys in by_section.items()}
+        if batch or flush:
+            self._queue.put((batch, flush))
+
+    def submit_all(self, data: Dict[str, Any], flush: bool = False):
+        """Queue every loaded section of ``data`` (after an import or migration)"""
+        sections = data.loaded_sections() if isinstance(data, storage.LazyUserData) else \
+            [section for section in storage.SECTIONS if section in data]
+        self.submit(data, [(table,) for section in sections for table in storage.SECTION_TABLES[section]], flush)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything pending now and wait for it (for shutdown and tests)"""
+        self._flushed.clear()
+        self._queue.put(({}, True))
+        return self._flushed.wait(timeout)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Final flush, then end the background thread"""
+        if not self._stopped:
+            self._stopped = True
+            self._queue.put(None)
+        self._thread.join(timeout)
+
+    def running(self) -> bool:
+        """Whether submissions are still written (False once stopped or the session ended)"""
+        return not self._stopped and self._thread.is_alive()
+
+    def _pending_count(self) -> int:
+        return sum(len(rows) + len(groups) for rows, groups in self._pending.values())
+
+    def _merge(self, batch):
+        for section, (rows, groups) in batch.items():
+            pending_rows, pending_groups = self._pending.setdefault(section, ({}, []))
+            for group in groups:
+                # Rows queued before a structural change may no longer exist
+                for key in [key for key in pending_rows if key[:len(group)] == group]:
+                    del pending_rows[key]
+                if group not in pending_groups:
+                    pending_groups.append(group)
+            pending_rows.update(rows)
+
+    def _due(self, now: float) -> bool:
+        if not self._pending:
+            return False
+        return (self._pending_count() >= self.batch_size
+                or now - self._last_submit >= self.debounce
+                or now - self._first_pending >= self.max_delay)
+
+    def _write(self):
+        pending, self._pending = self._pending, {}
+        for section, (rows, groups) in pending.items():
+            try:
+                start = time.perf_counter()
+                self.backend.save_rows(self.user_id, section, rows, groups)
+                self.last_write = (section, time.perf_counter() - start)
+                metrics.observe('handy_storage_seconds', self.last_write[1], operation='write', section=section)
+            except Exception:
+                logger.exception("Autosave of %s failed; retrying", section)
+                # Nothing else is queued while writing, so the batch goes back as is
+                self._merge({section: (rows, groups)})
+        now = time.monotonic()
+        self._first_pending = self._last_submit = now if self._pending else None
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=max(self.debounce / 2, MIN_POLL_SECONDS))
+            except queue.Empty:
+                item = ()
+            if item is None:
+                self._write()
+                self._flushed.set()
+                return
+            now = time.monotonic()
+            flush = False
+            if item:
+                batch, flush = item
+                if batch:
+                    self._merge(batch)
+                    self._last_submit = now
+                    if self._first_pending is None:
+                        self._first_pending = now
+            elif self.alive is not None and not self.alive():
+                # Session ended: final flush
+                self._stopped = True
+                self._write()
+                self._flushed.set()
+                return
+            if flush or self._due(now):
+                self._write()
+                if flush:
+                    self._flushed.set()
+
+
+@atexit.register
+def _flush_all():
+    for worker in list(_workers):
+        worker.stop(timeout=5)
@@ -0,0 +1,3 @@
+"""
+Performance benchmarks for Handy (run from the repository root, e.g. ``python -m benchmarks.startup``)
+"""
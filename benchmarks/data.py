@@ -0,0 +1,94 @@
+"""
+Synthetic user data for benchmarks
+
+``generate_user_data()`` builds a realistic, deterministic ``user_data`` dict
+in the current schema: goals in every life area, affirmations created over
+the period, and a reflection on most days rating the affirmations that
+existed by then.
+"""
+
+import random
+from datetime import date, timedelta
+from typing import Dict, Any
+
+import ratings
+from storage import SITUATION_SUFFIX, empty_user_data
+
+LIFE_AREAS = [
+    "Health & Fitness",
+    "Home & Family",
+    "Money & finances",
+    "Social life & relationships",
+    "Career, work & education",
+    "Life purpose & contribution",
+]
+
+MOODS = ["😢 Very Low", "😕 Low", "😐 Neutral", "🙂 Good", "😊 Very Good"]
+
+WORDS = ("daily focus health family money friends career purpose sleep water read walk "
+         "gratitude plan save learn call exercise cook rest write listen help build").split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def generate_user_data(goals_per_area: int = 50, affirmations: int = 300, days: int = 5 * 365,
+                       reflection_rate: float = 0.9, seed: int = 0, today: date = None) -> Dict[str, Any]:
+    """Return user data with 6 life areas x ``goals_per_area`` goals, ``affirmations``
+    affirmations and ``days`` days of history ending ``today``"""
+    rng = random.Random(seed)
+    today = today or date.today()
+    first_day = today - timedelta(days=days - 1)
+    data = empty_user_data()
+
+    data['profile'] = {
+        'job': 'Engineer',
+        'hobbies': ['Reading', 'Hiking'],
+        'life_area_priority': list(LIFE_AREAS),
+        'setup_completed': True,
+        'schema_version': ratings.SCHEMA_VERSION,
+    }
+
+    for area in LIFE_AREAS:
+        data['goals'][area + SITUATION_SUFFIX] = _text(rng, 30)
+        data['goals'][area] = [{
+            'title': _text(rng, 4),
+            'why': _text(rng, 20),
+            'how': _text(rng, 20),
+            'empowering_beliefs': _text(rng, 10),
+            'limiting_beliefs': _text(rng, 10),
+        } for _ in range(goals_per_area)]
+
+    # Affirmations are added over the period; each is rated from its creation day on
+    created = sorted(rng.randrange(days) for _ in range(affirmations))
+    for position, offset in enumerate(created):
+        data['affirmations'].append({
+            # Deterministic stand-in for ratings.new_affirmation_id()
+            'id': f"{rng.getrandbits(128):032x}",
+            'text': _text(rng, 8),
+            'area': rng.choice(LIFE_AREAS + [None]),
+            'priority': position + 1,
+            'created_date': str(first_day + timedelta(days=offset)),
+        })
+
+    for offset in range(days):
+        if rng.random() > reflection_rate:
+            continue
+        day = first_day + timedelta(days=offset)
+        reflection = {}
+        for affirmation, created_offset in zip(data['affirmations'], created):
+            if created_offset > offset:
+                break
+            reflection[ratings.rating_key(affirmation['id'])] = rng.randint(0, 10)
+            reflection[ratings.not_relevant_key(affirmation['id'])] = rng.random() < 0.05
+        mood_index = rng.randrange(len(MOODS))
+        reflection.update({
+            'notes': _text(rng, 15),
+            'mood': MOODS[mood_index],
+            'mood_index': mood_index,
+            'completed': True,
+            'completion_time': f"{day.isoformat()}T21:{rng.randrange(60):02d}:00",
+        })
+        data['daily_reflections'][day.isoformat()] = reflection
+    return data
@@ -0,0 +1,160 @@
+"""
+Page benchmarks over synthetic user data
+
+Drives every page headlessly with Streamlit's AppTest on a generated dataset
+and records, per page, the first-render and median rerun wall time, the peak
+Python memory of a first render and the delta payload bytes of a rerun:
+
+    python -m benchmarks.pages --output results.json
+    python -m benchmarks.pages --baseline results.json --tolerance 0.2
+
+With ``--baseline`` the exit status is 1 if a page got slower (or its memory
+or payload bigger) than the baseline by more than the tolerance.
+"""
+
+import argparse
+import copy
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Any
+
+from benchmarks.startup import APP, ROOT
+
+# Pages benchmarked by default; the first three are the ones with heavy data
+PAGES = ["Goals", "Daily Reflection", "Dashboard", "Affirmations", "Profile Setup", "Welcome"]
+
+# Compared against the baseline
+COMPARED = ('first_render_ms', 'rerun_ms', 'peak_memory_kb', 'delta_bytes')
+
+# Differences below these are noise, whatever the tolerance
+NOISE_FLOOR = {'first_render_ms': 5.0, 'rerun_ms': 5.0, 'delta_bytes': 256, 'peak_memory_kb': 512}
+
+
+class DeltaCounter:
+    """Counts the bytes of delta messages the script sends while installed"""
+
+    def __init__(self):
+        self.bytes = 0
+        self._original = None
+
+    def __enter__(self):
+        from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+        original = self._original = ForwardMsgQueue.enqueue
+        counter = self
+
+        def enqueue(queue, msg):
+            if msg.WhichOneof('type') == 'delta':
+                counter.bytes += msg.ByteSize()
+            return original(queue, msg)
+        ForwardMsgQueue.enqueue = enqueue
+        return self
+
+    def __exit__(self, *exc):
+        from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+        ForwardMsgQueue.enqueue = self._original
+
+
+def benchmark_page(page: str, user_data: Dict[str, Any], reruns: int) -> Dict[str, Any]:
+    """Measure one page in a fresh session holding a copy of ``user_data``"""
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(APP, default_timeout=600)
+    app.session_state.page = page
+    app.session_state.user_data = copy.deepcopy(user_data)
+
+    start = time.perf_counter()
+    app.run()
+    first_render_ms = (time.perf_counter() - start) * 1000
+    if app.exception:
+        raise RuntimeError(f"{page} raised: {app.exception[0].value}")
+
+    times = []
+    with DeltaCounter() as deltas:
+        for _ in range(reruns):
+            deltas.bytes = 0
+            start = time.perf_counter()
+            app.run()
+            times.append((time.perf_counter() - start) * 1000)
+
+    # Memory is measured on the first render of another fresh session, as tracing slows everything down
+    app = AppTest.from_file(APP, default_timeout=600)
+    app.session_state.page = page
+    app.session_state.user_data = copy.deepcopy(user_data)
+    tracemalloc.start()
+    app.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'first_render_ms': round(first_render_ms, 2),
+        'rerun_ms': round(statistics.median(times), 2),
+        'peak_memory_kb': round(peak / 1024, 1),
+        'delta_bytes': deltas.bytes,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of ``results`` against ``baseline``, as readable lines"""
+    regressions = []
+    for page, current in results['pages'].items():
+        previous = baseline.get('pages', {}).get(page)
+        if previous is None:
+            continue
+        for metric in COMPARED:
+            old, new = previous.get(metric), current[metric]
+            if old is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > NOISE_FLOOR[metric]:
+                regressions.append(f"{page}: {metric} {old} -> {new} (+{(new / old - 1) * 100 if old else 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", nargs="+", default=PAGES, help="pages to run")
+    parser.add_argument("--goals-per-area", type=int, default=50)
+    parser.add_argument("--affirmations", type=int, default=300)
+    parser.add_argument("--days", type=int, default=5 * 365)
+    parser.add_argument("--reruns", type=int, default=5, help="timed reruns per page (median reported)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, e.g. 0.2 = 20%%")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    from benchmarks.data import generate_user_data
+    import streamlit
+    user_data = generate_user_data(args.goals_per_area, args.affirmations, args.days)
+
+    results = {
+        'dataset': {'goals_per_area': args.goals_per_area, 'affirmations': args.affirmations, 'days': args.days},
+        'environment': {'python': platform.python_version(), 'streamlit': streamlit.__version__},
+        'pages': {},
+    }
+    # Warm up (imports, script compilation) so the first page measured is not penalised
+    benchmark_page("Welcome", user_data, 1)
+    for page in args.pages:
+        results['pages'][page] = benchmark_page(page, user_data, args.reruns)
+        print(f"{page:<20} " + "  ".join(f"{key} {value}" for key, value in results['pages'][page].items()))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('dataset') != results['dataset']:
+            print("Warning: the baseline was measured on a different dataset")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
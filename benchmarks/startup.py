@@ -0,0 +1,115 @@
+"""
+Startup-time benchmark
+
+Measures the cold import of handy.py in a fresh interpreter (``python -X
+importtime``) and the first render of every page in a new session, and exits
+with status 1 when either exceeds its budget:
+
+    python -m benchmarks.startup --import-budget-ms 1500 --render-budget-ms 1000
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Any
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "handy.py")
+
+# Default budgets, overridable with HANDY_IMPORT_BUDGET_MS / HANDY_RENDER_BUDGET_MS or the options below
+IMPORT_BUDGET_MS = float(os.environ.get('HANDY_IMPORT_BUDGET_MS', 1500))
+RENDER_BUDGET_MS = float(os.environ.get('HANDY_RENDER_BUDGET_MS', 1000))
+
+# Modules that must not be imported until a page needs them
+LAZY_MODULES = ['pandas', 'numpy', 'pyarrow']
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def measure_import() -> Dict[str, Any]:
+    """Cold import of handy in a new interpreter: total time and its slowest direct imports"""
+    code = "import sys, handy; print(','.join(m for m in %r if m in sys.modules))" % (LAZY_MODULES,)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    # Children are listed before their parent, one indent level (two spaces) deeper
+    children = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        if name == 'handy':
+            total_us = int(cumulative)
+            break
+        if len(indent) == 1:
+            children = {}
+        elif len(indent) == 3:
+            children[name] = int(cumulative)
+    slowest = sorted(children.items(), key=lambda item: -item[1])[:5]
+    loaded = [name for name in result.stdout.strip().split(',') if name]
+    return {
+        'import_ms': total_us / 1000,
+        'slowest': [(name, us / 1000) for name, us in slowest],
+        'eager_heavy_modules': loaded,
+    }
+
+
+def measure_first_render(pages: List[str]) -> Dict[str, float]:
+    """Milliseconds for the first run of each page in a fresh session"""
+    from streamlit.testing.v1 import AppTest
+    sys.path.insert(0, ROOT)
+    import handy  # imported once up front so the render times exclude the import
+    times = {}
+    for page in pages:
+        app = AppTest.from_file(APP, default_timeout=60)
+        app.session_state.page = page
+        start = time.perf_counter()
+        app.run()
+        times[page] = (time.perf_counter() - start) * 1000
+        if app.exception:
+            raise RuntimeError(f"{page} raised: {app.exception[0].value}")
+    return times
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--render-budget-ms", type=float, default=RENDER_BUDGET_MS)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    import handy
+    results = measure_import()
+    results['first_render_ms'] = measure_first_render(handy.PAGES)
+
+    failures = []
+    if results['import_ms'] > args.import_budget_ms:
+        failures.append(f"import took {results['import_ms']:.0f} ms (budget {args.import_budget_ms:.0f} ms)")
+    if results['eager_heavy_modules']:
+        failures.append(f"imported at startup: {', '.join(results['eager_heavy_modules'])}")
+    for page, ms in results['first_render_ms'].items():
+        if ms > args.render_budget_ms:
+            failures.append(f"{page} first render took {ms:.0f} ms (budget {args.render_budget_ms:.0f} ms)")
+    results['failures'] = failures
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"import handy: {results['import_ms']:.0f} ms")
+        for name, ms in results['slowest']:
+            print(f"  {name:<30} {ms:8.1f} ms")
+        for page, ms in results['first_render_ms'].items():
+            print(f"first render {page:<20} {ms:8.1f} ms")
+        for failure in failures:
+            print(f"OVER BUDGET: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
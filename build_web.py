@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Build the static web app for production
+
+Copies web/ to build/web with CSS, JS and HTML minified and every asset
+renamed after a hash of its contents (styles.css -> styles.<hash>.css), so
+serve_web.py can let browsers cache them forever. References in index.html
+and in stylesheets are rewritten to the new names. The build also writes
+precache-manifest.json and a service worker (sw.js) that stores all of it
+on the first visit and serves repeat and offline launches from that cache.
+
+Uses rcssmin / rjsmin when installed, otherwise a conservative built-in
+minifier (comments and indentation only).
+
+    python build_web.py && python serve_web.py --production --root build/web
+"""
+
+import argparse
+import hashlib
+import json
+import posixpath
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, List
+
+# Configuration
+WEB_DIR = Path(__file__).parent / "web"
+BUILD_DIR = Path(__file__).parent / "build" / "web"
+
+# Pages keep their names (they are the URLs people open); everything else is hashed
+PAGES = ('index.html',)
+HASH_LENGTH = 10
+
+# Files the build adds next to the assets
+SERVICE_WORKER = "sw.js"
+PRECACHE_MANIFEST = "precache-manifest.json"
+
+# Strings and comments, which the built-in minifiers must not break up
+CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+JS_TOKENS = re.compile(r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`)|/\*.*?\*/|//[^\n]*', re.S)
+# Elements whose contents keep their whitespace
+HTML_PRESERVED = re.compile(r'(<(pre|textarea)\b.*?</\2>)|<!--(?!\[).*?-->', re.S | re.I)
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+HTML_REFERENCE = re.compile(r'\b(href|src)="([^"]+)"')
+
+SERVICE_WORKER_TEMPLATE = """// Generated by build_web.py
+const VERSION = %(version)s;
+const PRECACHE = %(files)s;
+const CACHE = 'handy-' + VERSION;
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(CACHE).then(cache => cache.addAll(PRECACHE)).then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(
+                keys.filter(key => key.startsWith('handy-') && key !== CACHE).map(key => caches.delete(key))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const url = new URL(event.request.url);
+    if (event.request.method !== 'GET' || url.origin !== self.location.origin || url.pathname.startsWith('/api/')) {
+        return;
+    }
+    // Pages come from the precache too; a new build ships a new sw.js, which replaces them
+    const request = event.request.mode === 'navigate' ? 'index.html' : event.request;
+    event.respondWith(
+        caches.match(request, {cacheName: CACHE, ignoreSearch: true}).then(cached => cached || fetch(event.request))
+    );
+});
+"""
+
+SERVICE_WORKER_REGISTRATION = (
+    "<script>if('serviceWorker' in navigator){navigator.serviceWorker.register('%s')}</script>"
+    % SERVICE_WORKER
+)
+
+
+# Minifiers
+
+def _minify_code(text: str, tokens: re.Pattern, minify) -> str:
+    """Apply ``minify`` to the code between strings, dropping comments"""
+    parts = []
+    code = []
+    position = 0
+    for match in tokens.finditer(text):
+        code.append(text[position:match.start()])
+        position = match.end()
+        if match.group(1):
+            parts += [minify("".join(code)), match.group(1)]
+            code = []
+        else:
+            # A comment still separates the tokens around it
+            code.append('\n' if '\n' in match.group(0) else ' ')
+    code.append(text[position:])
+    parts.append(minify("".join(code)))
+    return "".join(parts)
+
+
+def _minify_css_code(code: str) -> str:
+    code = re.sub(r'\s+', ' ', code)
+    code = re.sub(r'\s*([{};,>])\s*', r'\1', code)
+    code = re.sub(r':\s+', ':', code)
+    return code.replace(';}', '}')
+
+
+def _minify_js_code(code: str) -> str:
+    # Newlines are kept, so automatic semicolon insertion still works
+    lines = (line.strip() for line in code.split('\n'))
+    return "\n".join(line for line in lines if line)
+
+
+def minify_css(text: str) -> str:
+    try:
+        import rcssmin
+        return rcssmin.cssmin(text)
+    except ImportError:
+        return _minify_code(text, CSS_TOKENS, _minify_css_code).strip()
+
+
+def minify_js(text: str) -> str:
+    try:
+        import rjsmin
+        return rjsmin.jsmin(text)
+    except ImportError:
+        # Regex literals containing // or /* are not recognised; app.js has none
+        return re.sub(r'\n\s*\n', '\n', _minify_code(text, JS_TOKENS, _minify_js_code)).strip()
+
+
+def minify_html(text: str) -> str:
+    """Drop comments and indentation, leaving <pre> and <textarea> contents alone"""
+    return _minify_code(text, HTML_PRESERVED, _minify_js_code)
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js, '.html': minify_html}
+
+
+# Build
+
+def hashed_name(relative: str, content: bytes) -> str:
+    stem, dot, suffix = posixpath.basename(relative).rpartition('.')
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    name = f"{stem}.{digest}.{suffix}" if dot else f"{suffix}.{digest}"
+    return posixpath.join(posixpath.dirname(relative), name)
+
+
+def rewrite(text: str, pattern: re.Pattern, group: int, base: str, renamed: Dict[str, str]) -> str:
+    """Replace references (relative to directory ``base``) to renamed files"""
+    def replace(match):
+        reference = match.group(group)
+        path, sep, rest = reference.partition('?')
+        if '://' in path or path.startswith(('data:', '#', '/')):
+            return match.group(0)
+        target = renamed.get(posixpath.normpath(posixpath.join(base, path)))
+        if target is None:
+            return match.group(0)
+        new = posixpath.relpath(target, base or '.')
+        start, end = match.span(group)
+        return match.group(0)[:start - match.start()] + new + match.group(0)[end - match.start():]
+    return pattern.sub(replace, text)
+
+
+def build(source: Path = WEB_DIR, output: Path = BUILD_DIR, minify: bool = True) -> Dict[str, str]:
+    """Build ``source`` into ``output``; returns {source path: built path}"""
+    files = sorted(path.relative_to(source).as_posix() for path in source.rglob('*') if path.is_file())
+    # Stylesheets last among the assets: they may point at images
+    assets = sorted((f for f in files if f not in PAGES), key=lambda f: f.endswith('.css'))
+    pages = [f for f in files if f in PAGES]
+
+    if output.exists():
+        shutil.rmtree(output)
+    renamed: Dict[str, str] = {}
+    written: Dict[str, bytes] = {}
+    for relative in assets:
+        content = (source / relative).read_bytes()
+        suffix = posixpath.splitext(relative)[1]
+        if suffix == '.css':
+            text = rewrite(content.decode('utf-8'), CSS_URL, 2, posixpath.dirname(relative), renamed)
+            content = (minify_css(text) if minify else text).encode('utf-8')
+        elif suffix == '.js' and minify:
+            content = minify_js(content.decode('utf-8')).encode('utf-8')
+        renamed[relative] = hashed_name(relative, content)
+        written[renamed[relative]] = content
+
+    for relative in pages:
+        text = rewrite((source / relative).read_text(encoding='utf-8'), HTML_REFERENCE, 2,
+                       posixpath.dirname(relative), renamed)
+        if minify:
+            text = minify_html(text)
+        text = text.replace('</body>', SERVICE_WORKER_REGISTRATION + '</body>', 1)
+        renamed[relative] = relative
+        written[relative] = text.encode('utf-8')
+
+    precache = ['./'] + sorted(written)
+    version = hashlib.sha256(b"".join(name.encode('utf-8') + hashlib.sha256(content).digest()
+                                      for name, content in sorted(written.items()))).hexdigest()[:HASH_LENGTH]
+    manifest = {'version': version, 'files': [{'url': name, 'size': len(written[name])} for name in sorted(written)]}
+    written[PRECACHE_MANIFEST] = (json.dumps(manifest, indent=2) + "\n").encode('utf-8')
+    written[SERVICE_WORKER] = (SERVICE_WORKER_TEMPLATE % {
+        'version': json.dumps(version), 'files': json.dumps(precache),
+    }).encode('utf-8')
+
+    for name, content in written.items():
+        path = output / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    return renamed
+
+
+def report(source: Path, output: Path, renamed: Dict[str, str]) -> List[str]:
+    lines = []
+    for relative, built in sorted(renamed.items()):
+        before, after = (source / relative).stat().st_size, (output / built).stat().st_size
+        lines.append(f"{relative:<28} -> {built:<36} {before:>7} -> {after:>7} bytes")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Handy web app for production")
+    parser.add_argument("--source", type=Path, default=WEB_DIR)
+    parser.add_argument("--output", type=Path, default=BUILD_DIR)
+    parser.add_argument("--no-minify", action="store_true", help="only hash and rewrite names")
+    args = parser.parse_args()
+
+    if not args.source.exists():
+        print(f"Error: Web directory not found at {args.source}")
+        return
+    renamed = build(args.source, args.output, minify=not args.no_minify)
+    print("\n".join(report(args.source, args.output, renamed)))
+    print(f"Built {len(renamed)} files, {SERVICE_WORKER} and {PRECACHE_MANIFEST} into {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Chart data preparation: time windows, rollups and downsampling
+
+Dashboard charts go through ``prepare_series`` so the number of points sent
+to the browser stays within MAX_CHART_POINTS however long the history is.
+"""
+
+from datetime import date, timedelta
+from typing import Optional
+
+# Range choices offered on the dashboard, in days (None = all history)
+RANGE_OPTIONS = {
+    "Last 7 days": 7,
+    "Last 30 days": 30,
+    "Last 90 days": 90,
+    "Last 365 days": 365,
+    "All": None,
+}
+
+# Resolution choices and the pandas resample rule for each
+RESOLUTION_OPTIONS = {
+    "Daily": None,
+    "Weekly": "W",
+    "Monthly": "MS",
+}
+
+# Upper bound on the points of a chart
+MAX_CHART_POINTS = 200
+
+# Affirmations drawn on the ratings chart (highest priority first)
+MAX_CHART_SERIES = 5
+
+
+def window(frame, days: Optional[int], today: Optional[date] = None):
+    """Keep the rows of a date-indexed frame that fall in the last ``days`` days"""
+    if days is None or frame.empty:
+        return frame
+    import pandas as pd
+    start = pd.Timestamp((today or date.today()) - timedelta(days=days - 1))
+    return frame.loc[frame.index >= start]
+
+
+def rollup(frame, rule: Optional[str]):
+    """Average a date-indexed frame per week/month (``rule`` is a pandas resample rule)"""
+    if rule is None or frame.empty:
+        return frame
+    return frame.astype('float64').resample(rule).mean().dropna(how='all')
+
+
+def lttb_indices(x, y, threshold: int):
+    """Row positions picked by largest-triangle-three-buckets downsampling
+
+    ``x`` and ``y`` are float NumPy arrays of equal length; the first and last
+    points are always kept.
+    """
+    import numpy as np
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    buckets = threshold - 2
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(buckets):
+        start = i * (n - 2) // buckets + 1
+        end = (i + 1) * (n - 2) // buckets + 1
+        next_end = min((i + 2) * (n - 2) // buckets + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def downsample(frame, max_points: int = MAX_CHART_POINTS):
+    """Reduce a date-indexed frame to at most ``max_points`` rows, keeping its shape
+
+    Single complete series use LTTB; frames with several columns or gaps are
+    averaged over equal-sized buckets so every column keeps the same index.
+    """
+    if len(frame) <= max_points:
+        return frame
+    import numpy as np
+    values = frame.astype('float64')
+    if values.shape[1] == 1 and not values.iloc[:, 0].isna().any():
+        x = frame.index.asi8.astype('float64')
+        y = values.iloc[:, 0].to_numpy()
+        return values.iloc[lttb_indices(x, y, max_points)]
+    buckets = np.arange(len(values)) * max_points // len(values)
+    result = values.groupby(buckets).mean()
+    # Label each bucket with the date of its first row
+    result.index = frame.index[np.flatnonzero(np.diff(buckets, prepend=-1))]
+    return result
+
+
+def prepare_series(frame, days: Optional[int], rule: Optional[str], max_points: int = MAX_CHART_POINTS):
+    """Window, roll up and downsample a date-indexed frame for charting"""
+    return downsample(rollup(window(frame, days), rule), max_points)
@@ -0,0 +1,729 @@
+"""
+Export and import of Handy user data
+
+Exports are produced section by section as a stream of text pieces and
+compressed chunk by chunk, so the uncompressed document is never held in
+memory as a whole.
+"""
+
+import io
+import json
+import re
+import zlib
+from datetime import date, datetime
+from typing import Dict, List, Iterable, Iterator, Any, Optional
+
+from storage import SECTIONS
+
+# Bytes of text collected before a chunk is compressed
+CHUNK_SIZE = 64 * 1024
+
+# Export formats: file extension and MIME type
+EXPORT_FORMATS = {
+    'ndjson': ('ndjson', 'application/x-ndjson'),
+    'json': ('json', 'application/json'),
+}
+
+NDJSON_FORMAT = "handy-ndjson"
+
+# Start of an NDJSON export's header line
+NDJSON_HEADER = re.compile(r'\{\s*"section"\s*:\s*"meta"')
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+
+def in_range(day: str, start: Optional[date] = None, end: Optional[date] = None) -> bool:
+    """Whether an ISO date string falls within [start, end] (open ends allowed)"""
+    return (start is None or day >= start.isoformat()) and (end is None or day <= end.isoformat())
+
+
+def iter_records(user_data: Dict[str, Any], start: Optional[date] = None,
+                 end: Optional[date] = None) -> Iterator[Dict[str, Any]]:
+    """Yield the user data as small records, one per goal area, affirmation or day"""
+    for section in SECTIONS:
+        value = user_data.get(section)
+        if value is None:
+            continue
+        if section in ('profile', 'life_areas'):
+            yield {'section': section, 'value': value}
+        elif section == 'affirmations':
+            for affirmation in value:
+                yield {'section': section, 'value': affirmation}
+        else:
+            for key, item in value.items():
+                if section == 'daily_reflections' and not in_range(key, start, end):
+                    continue
+                yield {'section': section, 'key': key, 'value': item}
+
+
+def iter_ndjson(user_data: Dict[str, Any], start: Optional[date] = None,
+                end: Optional[date] = None) -> Iterator[str]:
+    """Yield the export as newline-delimited JSON, starting with a header line"""
+    yield _dumps({'section': 'meta', 'format': NDJSON_FORMAT, 'exported': str(date.today())}) + "\n"
+    for record in iter_records(user_data, start, end):
+        yield _dumps(record) + "\n"
+
+
+def iter_json(user_data: Dict[str, Any], start: Optional[date] = None,
+              end: Optional[date] = None) -> Iterator[str]:
+    """Yield the export as one compact JSON document with the same shape as ``user_data``"""
+    yield "{"
+    first_section = True
+    for section in SECTIONS:
+        value = user_data.get(section)
+        if value is None:
+            continue
+        yield ("" if first_section else ",") + _dumps(section) + ":"
+        first_section = False
+        if section in ('profile', 'life_areas'):
+            yield _dumps(value)
+        elif section == 'affirmations':
+            yield "["
+            for i, affirmation in enumerate(value):
+                yield ("," if i else "") + _dumps(affirmation)
+            yield "]"
+        else:
+            yield "{"
+            first_item = True
+            for key, item in value.items():
+                if section == 'daily_reflections' and not in_range(key, start, end):
+                    continue
+                yield ("" if first_item else ",") + _dumps(key) + ":" + _dumps(item)
+                first_item = False
+            yield "}"
+    yield "}"
+
+
+def encode_chunks(pieces: Iterable[str], compress: bool = True,
+                  chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Group text pieces into chunks of about ``chunk_size`` bytes, gzip-compressing each"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            data = "".join(buffer).encode('utf-8')
+            buffer, size = [], 0
+            data = compressor.compress(data) if compressor else data
+            if data:
+                yield data
+    data = "".join(buffer).encode('utf-8')
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+def iter_export(user_data: Dict[str, Any], fmt: str = 'ndjson', compress: bool = True,
+                start: Optional[date] = None, end: Optional[date] = None) -> Iterator[bytes]:
+    """Return an iterator over the encoded export, chunk by chunk"""
+    pieces = iter_ndjson(user_data, start, end) if fmt == 'ndjson' else iter_json(user_data, start, end)
+    return encode_chunks(pieces, compress)
+
+
+def export_bytes(user_data: Dict[str, Any], fmt: str = 'ndjson', compress: bool = True,
+                 start: Optional[date] = None, end: Optional[date] = None) -> bytes:
+    """Return the whole (compressed) export; only the encoded output is held in memory"""
+    output = io.BytesIO()
+    for chunk in iter_export(user_data, fmt, compress, start, end):
+        output.write(chunk)
+    return output.getvalue()
+
+
+def export_to_file(path: str, user_data: Dict[str, Any], fmt: str = 'ndjson', compress: bool = True,
+                   start: Optional[date] = None, end: Optional[date] = None):
+    """Stream an export straight to a file"""
+    with open(path, 'wb') as f:
+        for chunk in iter_export(user_data, fmt, compress, start, end):
+            f.write(chunk)
+
+
+def export_file_name(fmt: str = 'ndjson', compress: bool = True) -> str:
+    extension = EXPORT_FORMATS[fmt][0] + (".gz" if compress else "")
+    return f"handy_data_{date.today()}.{extension}"
+
+
+def export_mime(fmt: str = 'ndjson', compress: bool = True) -> str:
+    return "application/gzip" if compress else EXPORT_FORMATS[fmt][1]
+
+
+# Import
+
+class ImportValidationError(ValueError):
+    """Raised when an import file is malformed or does not match the user data schema"""
+
+
+# Expected types of known fields; unknown fields are accepted as-is
+PROFILE_FIELDS = {
+    'job': str,
+    'hobbies': list,
+    'life_area_priority': list,
+    'setup_completed': bool,
+    'schema_version': int,
+}
+GOAL_FIELDS = ('title', 'why', 'how', 'empowering_beliefs', 'limiting_beliefs')
+AFFIRMATION_FIELDS = {
+    'id': str,
+    'text': str,
+    'priority': int,
+    'area': (str, type(None)),
+    'created_date': str,
+}
+REFLECTION_FIELDS = {
+    'notes': str,
+    'mood': str,
+    'mood_index': int,
+    'completed': bool,
+    'completion_time': str,
+}
+
+# Records read between progress callbacks
+PROGRESS_EVERY = 500
+
+_decoder = json.JSONDecoder()
+
+
+def _check(condition: bool, where: str, message: str):
+    if not condition:
+        raise ImportValidationError(f"{where}: {message}")
+
+
+def _check_fields(value: Any, fields: Dict[str, Any], where: str):
+    _check(isinstance(value, dict), where, "expected an object")
+    for name, kind in fields.items():
+        if name in value:
+            _check(isinstance(value[name], kind) and not (kind is int and isinstance(value[name], bool)),
+                   where, f"'{name}' has the wrong type")
+
+
+def validate_record(record: Dict[str, Any], schema_version: int = 1):
+    """Check one import record against the user data schema
+
+    ``schema_version`` is that of the imported profile; from version 2 on
+    affirmations must have an ID (see ratings.migrate_affirmation_ids).
+    """
+    _check(isinstance(record, dict), "record", "expected an object")
+    section = record.get('section')
+    value = record.get('value')
+    _check(section in SECTIONS, "record", f"unknown section {section!r}")
+    key = record.get('key')
+    where = section if key is None else f"{section}[{key!r}]"
+
+    if section == 'profile':
+        _check_fields(value, PROFILE_FIELDS, where)
+    elif section == 'life_areas':
+        _check(isinstance(value, dict), where, "expected an object")
+    elif section == 'goals':
+        _check(isinstance(key, str), where, "missing key")
+        if key.endswith("_current"):
+            _check(isinstance(value, str), where, "expected a string")
+        else:
+            _check(isinstance(value, list), where, "expected a list of goals")
+            for i, goal in enumerate(value):
+                _check(isinstance(goal, dict), f"{where}[{i}]", "expected an object")
+                for name in GOAL_FIELDS:
+                    _check(isinstance(goal.get(name, ''), str), f"{where}[{i}]", f"'{name}' must be a string")
+    elif section == 'affirmations':
+        _check_fields(value, AFFIRMATION_FIELDS, where)
+        _check('text' in value, where, "missing 'text'")
+        if schema_version >= 2:
+            _check(isinstance(value.get('id'), str), where, "missing 'id'")
+    elif section == 'daily_reflections':
+        _check(isinstance(key, str), where, "missing key")
+        try:
+            date.fromisoformat(key)
+        except ValueError:
+            raise ImportValidationError(f"{where}: not an ISO date")
+        _check_fields(value, REFLECTION_FIELDS, where)
+        for name, item in value.items():
+            if name.startswith('aff_') and name.endswith('_rating'):
+                _check(isinstance(item, int) and not isinstance(item, bool) and 0 <= item <= 10,
+                       where, f"'{name}' must be an integer from 0 to 10")
+            elif name.startswith('aff_') and name.endswith('_not_relevant'):
+                _check(isinstance(item, bool), where, f"'{name}' must be true or false")
+
+
+class _JSONStream:
+    """Incremental reader of JSON values from a text stream"""
+
+    def __init__(self, text: io.TextIOBase, chunk_size: int = CHUNK_SIZE):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        chunk = self.text.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it ('' at the end)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ImportValidationError(f"Invalid JSON: expected {char!r}, found {found or 'end of file'!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # A value ending exactly at the buffer end may be cut short (e.g. a number)
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise ImportValidationError(f"Invalid JSON: {e.msg}")
+            self._fill()
+
+    def items(self, close: str) -> Iterator[None]:
+        """Step through a comma-separated sequence until ``close``; the caller reads each item"""
+        if self.peek() == close:
+            self.pos += 1
+            return
+        while True:
+            yield
+            found = self.peek()
+            if found == close:
+                self.pos += 1
+                return
+            self.expect(",")
+
+
+def _json_document_records(stream: _JSONStream) -> Iterator[Dict[str, Any]]:
+    """Yield records from a (compact or indented) JSON export, one item at a time"""
+    stream.expect("{")
+    for _ in stream.items("}"):
+        section = stream.value()
+        stream.expect(":")
+        if section not in SECTIONS:
+            raise ImportValidationError(f"record: unknown section {section!r}")
+        if section in ('profile', 'life_areas'):
+            yield {'section': section, 'value': stream.value()}
+        elif section == 'affirmations':
+            if stream.peek() == "{":
+                # Exports made before affirmations became a list stored them as {}
+                stream.expect("{")
+                stream.expect("}")
+                continue
+            stream.expect("[")
+            for _ in stream.items("]"):
+                yield {'section': section, 'value': stream.value()}
+        else:
+            stream.expect("{")
+            for _ in stream.items("}"):
+                key = stream.value()
+                stream.expect(":")
+                yield {'section': section, 'key': key, 'value': stream.value()}
+    if stream.peek():
+        raise ImportValidationError("Invalid JSON: trailing data after the document")
+
+
+def _is_ndjson(stream: _JSONStream) -> bool:
+    """Whether the stream starts with an NDJSON header (looks at the first key only)"""
+    return stream.peek() == "{" and NDJSON_HEADER.match(stream.buf, stream.pos) is not None
+
+
+def _remaining_lines(stream: _JSONStream) -> Iterator[str]:
+    """The lines of the stream after what it has consumed"""
+    lines = stream.buf[stream.pos:].splitlines(True)
+    if lines and not lines[-1].endswith("\n"):
+        lines[-1] += stream.text.readline()
+    yield from lines
+    yield from stream.text
+
+
+def _ndjson_records(stream: _JSONStream) -> Iterator[Dict[str, Any]]:
+    """Yield records from the lines following an NDJSON header"""
+    stream.value()
+    for number, line in enumerate(_remaining_lines(stream), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ImportValidationError(f"line {number}: invalid JSON ({e.msg})")
+        _check(isinstance(record, dict), f"line {number}", "expected an object")
+        if record.get('section') != 'meta':
+            yield record
+
+
+def _open_text(fileobj) -> io.TextIOBase:
+    """Wrap an uploaded binary file, transparently decompressing gzip"""
+    import gzip
+    head = fileobj.read(2)
+    fileobj.seek(0)
+    if head == b"\x1f\x8b":
+        fileobj = gzip.GzipFile(fileobj=fileobj, mode='rb')
+    return io.TextIOWrapper(fileobj, encoding='utf-8')
+
+
+def iter_import_records(fileobj, total_size: Optional[int] = None, progress=None) -> Iterator[Dict[str, Any]]:
+    """Yield validated records from an NDJSON or JSON export (optionally gzipped)
+
+    ``progress`` is called with the fraction of ``fileobj`` consumed so far.
+    """
+    raw = fileobj
+    schema_version = 1
+    try:
+        stream = _JSONStream(_open_text(fileobj))
+        records = _ndjson_records(stream) if _is_ndjson(stream) else _json_document_records(stream)
+        for count, record in enumerate(records, 1):
+            validate_record(record, schema_version)
+            if record['section'] == 'profile':
+                # Exports write the profile first; read_import checks the rest again
+                schema_version = record['value'].get('schema_version', schema_version)
+            yield record
+            if progress and total_size and count % PROGRESS_EVERY == 0:
+                progress(min(raw.tell() / total_size, 1.0))
+    except (EOFError, UnicodeDecodeError, OSError, zlib.error) as e:
+        # Truncated or corrupt gzip, or bytes that are not UTF-8
+        raise ImportValidationError(f"The file could not be read: {e}")
+    if progress:
+        progress(1.0)
+
+
+def read_import(fileobj, total_size: Optional[int] = None, progress=None) -> Dict[str, Any]:
+    """Read and validate a whole import into a user-data-shaped dict
+
+    Raises ImportValidationError on the first problem, before anything is merged.
+    """
+    from storage import empty_user_data
+    imported = empty_user_data()
+    for record in iter_import_records(fileobj, total_size, progress):
+        section, value = record['section'], record['value']
+        if section in ('profile', 'life_areas'):
+            imported[section].update(value)
+        elif section == 'affirmations':
+            imported[section].append(value)
+        else:
+            imported[section][record['key']] = value
+    schema_version = imported['profile'].get('schema_version', 1)
+    if schema_version >= 2:
+        # In case the profile came after the affirmations
+        for affirmation in imported['affirmations']:
+            validate_record({'section': 'affirmations', 'value': affirmation}, schema_version)
+    return imported
+
+
+def merge_user_data(user_data: Dict[str, Any], imported: Dict[str, Any]) -> Dict[str, int]:
+    """Merge imported data into ``user_data`` in place and return counts of merged items
+
+    Profile and situation fields are overwritten, goals are matched by title
+    within their area, affirmations by ID, and days are last-writer-wins
+    (the existing day is kept only if it was completed later).
+    """
+    counts = {'goals': 0, 'affirmations': 0, 'days': 0}
+
+    user_data['profile'].update({k: v for k, v in imported['profile'].items() if k != 'schema_version'})
+    user_data['life_areas'].update(imported['life_areas'])
+
+    goals = user_data['goals']
+    for key, value in imported['goals'].items():
+        if not isinstance(value, list):
+            goals[key] = value
+            continue
+        existing = goals.setdefault(key, [])
+        by_title = {goal.get('title'): i for i, goal in enumerate(existing) if goal.get('title')}
+        for goal in value:
+            position = by_title.get(goal.get('title')) if goal.get('title') else None
+            if position is None:
+                existing.append(goal)
+            else:
+                existing[position] = goal
+            counts['goals'] += 1
+
+    affirmations = user_data['affirmations']
+    by_id = {affirmation.get('id'): i for i, affirmation in enumerate(affirmations)}
+    for affirmation in imported['affirmations']:
+        position = by_id.get(affirmation.get('id'))
+        if position is None:
+            by_id[affirmation.get('id')] = len(affirmations)
+            affirmations.append(affirmation)
+        else:
+            affirmations[position] = affirmation
+        counts['affirmations'] += 1
+
+    reflections = user_data['daily_reflections']
+    for day, reflection in imported['daily_reflections'].items():
+        current = reflections.get(day)
+        if current and current.get('completion_time', '') > reflection.get('completion_time', ''):
+            continue
+        reflections[day] = reflection
+        counts['days'] += 1
+    return counts
+
+
+# Columnar (Parquet / Arrow IPC) export and import
+#
+# A columnar export is a zip with one typed table per kind of row plus
+# profile.json, so every table loads straight into a DataFrame with
+# pd.read_parquet / pd.read_feather. pyarrow is optional and only needed here.
+
+# Columnar formats: table file extension
+COLUMNAR_FORMATS = {
+    'parquet': 'parquet',
+    'arrow': 'arrow',
+}
+
+PROFILE_MEMBER = "profile.json"
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Columnar export needs pyarrow. Please install with: pip install pyarrow")
+    return pyarrow
+
+
+def _parse_date(value: Optional[str]) -> Optional[datetime]:
+    """A day as midnight, for the timestamp('s') day columns"""
+    try:
+        return datetime.fromisoformat(value[:10]) if value else None
+    except ValueError:
+        return None
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """A completion time, or None if it is missing or malformed (left out of the export)"""
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _day_string(value, where: str) -> str:
+    """ISO day of a day column value (a datetime, or a date in older exports)"""
+    if isinstance(value, datetime):
+        value = value.date()
+    _check(isinstance(value, date), where, "missing or invalid day")
+    return value.isoformat()
+
+
+def columnar_tables(user_data: Dict[str, Any], start: Optional[date] = None,
+                    end: Optional[date] = None) -> Dict[str, Any]:
+    """Build typed pyarrow tables for reflections, goals and affirmations
+
+    Days are second-resolution timestamps at midnight, which pandas reads as
+    datetime64 columns (date32 columns would come back as Python objects).
+    """
+    pa = _require_pyarrow()
+    from ratings import parse_reflection, NO_RATING
+
+    rating_rows = {'day': [], 'affirmation_id': [], 'rating': [], 'not_relevant': []}
+    days = {'day': [], 'mood': [], 'mood_index': [], 'notes': [], 'completed': [], 'completion_time': []}
+    for day, reflection in user_data['daily_reflections'].items():
+        if not in_range(day, start, end):
+            continue
+        day_value = _parse_date(day)
+        for affirmation_id, (rating, not_relevant) in parse_reflection(reflection).items():
+            rating_rows['day'].append(day_value)
+            rating_rows['affirmation_id'].append(affirmation_id)
+            rating_rows['rating'].append(None if rating == NO_RATING else rating)
+            rating_rows['not_relevant'].append(not_relevant)
+        days['day'].append(day_value)
+        days['mood'].append(reflection.get('mood'))
+        days['mood_index'].append(reflection.get('mood_index'))
+        days['notes'].append(reflection.get('notes'))
+        days['completed'].append(bool(reflection.get('completed', False)))
+        days['completion_time'].append(_parse_timestamp(reflection.get('completion_time')))
+
+    goals = {'area': [], 'position': []}
+    goals.update({name: [] for name in GOAL_FIELDS})
+    situations = {'area': [], 'text': []}
+    for key, value in user_data['goals'].items():
+        if isinstance(value, list):
+            for position, goal in enumerate(value):
+                goals['area'].append(key)
+                goals['position'].append(position)
+                for name in GOAL_FIELDS:
+                    goals[name].append(goal.get(name, ''))
+        elif key.endswith("_current"):
+            situations['area'].append(key[:-len("_current")])
+            situations['text'].append(value)
+
+    affirmations = {'id': [], 'text': [], 'priority': [], 'area': [], 'created_date': []}
+    for affirmation in user_data['affirmations']:
+        affirmations['id'].append(affirmation.get('id'))
+        affirmations['text'].append(affirmation.get('text', ''))
+        affirmations['priority'].append(affirmation.get('priority'))
+        affirmations['area'].append(affirmation.get('area'))
+        affirmations['created_date'].append(_parse_date(affirmation.get('created_date')))
+
+    return {
+        'reflection_ratings': pa.table({
+            'day': pa.array(rating_rows['day'], pa.timestamp('s')),
+            'affirmation_id': pa.array(rating_rows['affirmation_id'], pa.string()).dictionary_encode(),
+            'rating': pa.array(rating_rows['rating'], pa.int8()),
+            'not_relevant': pa.array(rating_rows['not_relevant'], pa.bool_()),
+        }),
+        'reflection_days': pa.table({
+            'day': pa.array(days['day'], pa.timestamp('s')),
+            'mood': pa.array(days['mood'], pa.string()),
+            'mood_index': pa.array(days['mood_index'], pa.int8()),
+            'notes': pa.array(days['notes'], pa.string()),
+            'completed': pa.array(days['completed'], pa.bool_()),
+            'completion_time': pa.array(days['completion_time'], pa.timestamp('us')),
+        }),
+        'goals': pa.table({
+            'area': pa.array(goals['area'], pa.string()),
+            'position': pa.array(goals['position'], pa.int32()),
+            **{name: pa.array(goals[name], pa.string()) for name in GOAL_FIELDS},
+        }),
+        'goal_situations': pa.table({
+            'area': pa.array(situations['area'], pa.string()),
+            'text': pa.array(situations['text'], pa.string()),
+        }),
+        'affirmations': pa.table({
+            'id': pa.array(affirmations['id'], pa.string()),
+            'text': pa.array(affirmations['text'], pa.string()),
+            'priority': pa.array(affirmations['priority'], pa.int32()),
+            'area': pa.array(affirmations['area'], pa.string()),
+            'created_date': pa.array(affirmations['created_date'], pa.timestamp('s')),
+        }),
+    }
+
+
+def export_columnar(user_data: Dict[str, Any], fmt: str = 'parquet', start: Optional[date] = None,
+                    end: Optional[date] = None) -> bytes:
+    """Return a zip of Parquet or Arrow IPC tables plus profile.json"""
+    import zipfile
+    pa = _require_pyarrow()
+    output = io.BytesIO()
+    # Table files are compressed internally, so the zip only stores them
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+        for name, table in columnar_tables(user_data, start, end).items():
+            sink = pa.BufferOutputStream()
+            if fmt == 'parquet':
+                import pyarrow.parquet as pq
+                pq.write_table(table, sink)
+            else:
+                import pyarrow.feather as feather
+                feather.write_feather(table, sink)
+            archive.writestr(f"{name}.{COLUMNAR_FORMATS[fmt]}", sink.getvalue().to_pybytes())
+        archive.writestr(PROFILE_MEMBER, _dumps({'profile': user_data['profile'],
+                                                 'life_areas': user_data['life_areas']}))
+    return output.getvalue()
+
+
+def columnar_file_name(fmt: str = 'parquet') -> str:
+    return f"handy_data_{date.today()}.{COLUMNAR_FORMATS[fmt]}.zip"
+
+
+def _read_table(data: bytes, fmt: str):
+    pa = _require_pyarrow()
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(pa.BufferReader(data))
+    import pyarrow.feather as feather
+    return feather.read_table(pa.BufferReader(data))
+
+
+def read_columnar(fileobj) -> Dict[str, Any]:
+    """Read a columnar export back into a validated, user-data-shaped dict"""
+    import zipfile
+    from storage import empty_user_data
+    from ratings import rating_key, not_relevant_key
+
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise ImportValidationError("Not a columnar export (expected a zip file)")
+    names = set(archive.namelist())
+    fmt = next((fmt for fmt, ext in COLUMNAR_FORMATS.items() if f"goals.{ext}" in names), None)
+    if fmt is None or PROFILE_MEMBER not in names:
+        raise ImportValidationError("Not a columnar export (missing tables or profile.json)")
+
+    def member(name: str) -> str:
+        return f"{name}.{COLUMNAR_FORMATS[fmt]}"
+
+    def columns(name: str, required: List[str]) -> Dict[str, List[Any]]:
+        if member(name) not in names:
+            return {column: [] for column in required}
+        try:
+            table = _read_table(archive.read(member(name)), fmt)
+        except Exception as e:
+            raise ImportValidationError(f"{member(name)}: unreadable table ({e})")
+        missing = [column for column in required if column not in table.column_names]
+        _check(not missing, member(name), f"missing columns {', '.join(missing)}")
+        return {column: table.column(column).to_pylist() for column in table.column_names}
+
+    imported = empty_user_data()
+    try:
+        header = json.loads(archive.read(PROFILE_MEMBER))
+    except ValueError as e:
+        # Also UnicodeDecodeError
+        raise ImportValidationError(f"{PROFILE_MEMBER}: invalid JSON ({e})")
+    _check(isinstance(header, dict), PROFILE_MEMBER, "expected an object")
+    for section in ('profile', 'life_areas'):
+        _check(isinstance(header.get(section, {}), dict), f"{PROFILE_MEMBER} {section}", "expected an object")
+        imported[section].update(header.get(section, {}))
+
+    fields = ['mood', 'mood_index', 'notes', 'completed', 'completion_time']
+    days = columns('reflection_days', ['day'] + fields)
+    for i, day in enumerate(days['day']):
+        where = f"{member('reflection_days')} row {i}"
+        reflection = imported['daily_reflections'].setdefault(_day_string(day, where), {})
+        for name in fields:
+            value = days[name][i]
+            if name == 'completion_time' and value is not None:
+                _check(isinstance(value, datetime), where, "'completion_time' is not a timestamp")
+                value = value.isoformat()
+            if value is not None:
+                reflection[name] = value
+
+    rating_rows = columns('reflection_ratings', ['day', 'affirmation_id', 'rating', 'not_relevant'])
+    for i, (day, affirmation_id, rating, not_relevant) in enumerate(zip(
+            rating_rows['day'], rating_rows['affirmation_id'], rating_rows['rating'], rating_rows['not_relevant'])):
+        where = f"{member('reflection_ratings')} row {i}"
+        reflection = imported['daily_reflections'].setdefault(_day_string(day, where), {})
+        _check(isinstance(affirmation_id, str), where, "missing affirmation_id")
+        if rating is not None:
+            reflection[rating_key(affirmation_id)] = rating
+        reflection[not_relevant_key(affirmation_id)] = bool(not_relevant)
+
+    goals = columns('goals', ['area', 'position'] + list(GOAL_FIELDS))
+    for i, (area, position) in enumerate(zip(goals['area'], goals['position'])):
+        _check(isinstance(area, str) and isinstance(position, int), f"{member('goals')} row {i}",
+               "missing area or position")
+    for area, _, i in sorted(zip(goals['area'], goals['position'], range(len(goals['area'])))):
+        imported['goals'].setdefault(area, []).append({name: goals[name][i] or '' for name in GOAL_FIELDS})
+    situations = columns('goal_situations', ['area', 'text'])
+    for i, (area, text) in enumerate(zip(situations['area'], situations['text'])):
+        _check(isinstance(area, str), f"{member('goal_situations')} row {i}", "missing area")
+        imported['goals'][f"{area}_current"] = text or ''
+
+    affirmations = columns('affirmations', ['id', 'text', 'priority', 'area', 'created_date'])
+    for i, affirmation_id in enumerate(affirmations['id']):
+        created = affirmations['created_date'][i]
+        affirmation = {'id': affirmation_id, 'text': affirmations['text'][i] or '',
+                       'priority': affirmations['priority'][i], 'area': affirmations['area'][i],
+                       'created_date': _day_string(created, f"{member('affirmations')} row {i}") if created else None}
+        imported['affirmations'].append({k: v for k, v in affirmation.items() if v is not None or k == 'area'})
+
+    schema_version = imported['profile'].get('schema_version', 1)
+    for record in iter_records(imported):
+        validate_record(record, schema_version)
+    return imported
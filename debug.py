@@ -0,0 +1,121 @@
+"""
+Debug / profiling panel
+
+Nothing here runs unless "Show Debug Info" is checked. The panel shows a fixed
+number of entries and keeps its history in bounded deques, so its size and
+cost do not grow with the user's data or the length of the session.
+"""
+
+import pickle
+import sys
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple
+
+# Measurements kept per page and for storage
+HISTORY = 20
+
+# Session state keys listed, largest first
+TOP_KEYS = 10
+
+# Session state keys that hold services rather than data, and are not measured
+SKIPPED_KEYS = ('storage_backend', 'autosave_worker')
+
+
+class DebugStats:
+    """Render and storage timings of one session"""
+
+    def __init__(self):
+        self.render_ms: Dict[str, deque] = {}
+        # (operation, section, milliseconds)
+        self.storage_ms = deque(maxlen=HISTORY)
+        # Session state key -> (value identity, data version, size, exact)
+        self.sizes: Dict[str, Tuple[int, Any, int, bool]] = {}
+
+    def record_render(self, page: str, ms: float):
+        self.render_ms.setdefault(page, deque(maxlen=HISTORY)).append(ms)
+
+    def record_storage(self, operation: str, section: Optional[str], seconds: float):
+        self.storage_ms.append((operation, section, seconds * 1000))
+
+
+def value_size(value: Any) -> Tuple[int, bool]:
+    """Approximate size in bytes of a session state value, and whether it is exact (pickled)"""
+    if isinstance(value, dict) and type(value) is not dict:
+        # LazyUserData and friends: measure the loaded contents, not the backend
+        value = dict(value)
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)), True
+    except Exception:
+        return sys.getsizeof(value), False
+
+
+def state_sizes(state, limit: int = TOP_KEYS, cache: Optional[Dict] = None,
+                version: Any = None) -> Tuple[List[Tuple[str, int, bool]], int]:
+    """The ``limit`` largest session state keys and the total size of all of them
+
+    With a ``cache`` (DebugStats.sizes), a value is only measured again when it
+    is replaced or ``version`` (which should change with every data edit) moves
+    on, so an idle rerun does not serialise the whole dataset.
+    """
+    sizes = []
+    for key in list(state.keys()):
+        if key in SKIPPED_KEYS:
+            continue
+        value = state[key]
+        # Lazily loaded user data grows as sections are read
+        stamp = (version, tuple(value.loaded_sections())) if hasattr(value, 'loaded_sections') else version
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None and cached[0] == id(value) and cached[1] == stamp:
+            size, exact = cached[2], cached[3]
+        else:
+            size, exact = value_size(value)
+            if cache is not None:
+                cache[key] = (id(value), stamp, size, exact)
+        sizes.append((str(key), size, exact))
+    sizes.sort(key=lambda item: -item[1])
+    return sizes[:limit], sum(size for _, size, _ in sizes)
+
+
+def widget_count() -> Optional[int]:
+    """Widgets registered in the current run, if this Streamlit exposes them"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        return len(get_script_run_ctx().widget_ids_this_run)
+    except (ImportError, AttributeError, TypeError):
+        return None
+
+
+def format_bytes(size: int) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024 or unit == 'MB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def render_panel(container, stats: DebugStats, state, reruns: int, last_write=None, version: Any = None):
+    """Fill ``container`` (e.g. a sidebar placeholder) with the panel
+
+    ``version`` identifies the state of the user data; see state_sizes().
+    """
+    panel = container.container()
+    lines = [f"**Reruns this session:** {reruns}"]
+    widgets = widget_count()
+    if widgets is not None:
+        lines.append(f"**Widgets this run:** {widgets}")
+    panel.markdown("  \n".join(lines))
+
+    rows = ["| Page | Last ms | Avg ms | Max ms |", "|---|---:|---:|---:|"]
+    for page, times in stats.render_ms.items():
+        rows.append(f"| {page} | {times[-1]:.1f} | {sum(times) / len(times):.1f} | {max(times):.1f} |")
+    panel.markdown(f"**Render time** (last {HISTORY} runs per page)\n\n" + "\n".join(rows))
+
+    largest, total = state_sizes(state, cache=stats.sizes, version=version)
+    rows = ["| Key | Size |", "|---|---:|"]
+    rows += [f"| `{key}` | {'' if exact else '≥ '}{format_bytes(size)} |" for key, size, exact in largest]
+    panel.markdown(f"**Session state:** {format_bytes(total)} in {len(state.keys())} keys\n\n" + "\n".join(rows))
+
+    rows = ["| Operation | Section | ms |", "|---|---|---:|"]
+    rows += [f"| {operation} | {section or 'all'} | {ms:.2f} |" for operation, section, ms in reversed(stats.storage_ms)]
+    if last_write is not None:
+        rows.append(f"| background write | {last_write[0]} | {last_write[1] * 1000:.2f} |")
+    panel.markdown("**Storage latency** (latest first)\n\n" + "\n".join(rows))
@@ -1,42 +1,168 @@
 #!/usr/bin/env python3
 """
 Generate PWA icons from SVG source
-Requires: cairosvg (pip install cairosvg)
+Requires: cairosvg (pip install cairosvg); --downscale also needs Pillow
+
+Icons are rendered in parallel, one process per size. A small manifest of
+hashes (icons.lock.json) records the source each icon was made from, so a
+run where the SVG did not change writes nothing. With --downscale the SVG is
+rendered once at 512px and the smaller sizes are resampled from it.
+--manifest writes the icon entries into a web app manifest.json.
 """
 
+import argparse
+import hashlib
+import io
+import json
 import os
 import sys
-try:
-    import cairosvg
-except ImportError:
-    print("Error: cairosvg not installed. Please install with: pip install cairosvg")
-    print("Or use another tool to convert the SVG to PNG in the required sizes.")
-    sys.exit(1)
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional
 
 # Icon sizes needed for PWA
 ICON_SIZES = [72, 96, 128, 144, 152, 192, 384, 512]
 
-def generate_icons():
-    """Generate PNG icons from SVG source"""
+ICON_DIR = "static/icons"
+SVG_PATH = os.path.join(ICON_DIR, "icon-192x192.svg")
+
+# Hashes of the source each icon was generated from
+LOCK_FILE = "icons.lock.json"
+
+def icon_path(size: int) -> str:
+    return os.path.join(ICON_DIR, f"icon-{size}x{size}.png")
+
+def file_hash(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def render(svg_path: str, size: int, output_path: str):
+    """Rasterise the SVG at ``size`` (runs in a worker process)"""
+    import cairosvg
+    cairosvg.svg2png(url=svg_path, write_to=output_path, output_width=size, output_height=size)
+
+def downscale(svg_path: str, sizes: List[int]) -> List[int]:
+    """Render once at the largest size and resample the others from it"""
+    import cairosvg
+    from PIL import Image
+    largest = max(ICON_SIZES)
+    master = Image.open(io.BytesIO(cairosvg.svg2png(url=svg_path, output_width=largest, output_height=largest)))
+    master.load()
+    for size in sizes:
+        image = master if size == largest else master.resize((size, size), Image.LANCZOS)
+        image.save(icon_path(size), optimize=True)
+    return sizes
+
+def load_lock() -> Dict[str, Any]:
+    try:
+        with open(os.path.join(ICON_DIR, LOCK_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_lock(lock: Dict[str, Any]):
+    with open(os.path.join(ICON_DIR, LOCK_FILE), 'w') as f:
+        json.dump(lock, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def stale_sizes(source_hash: str, method: str, lock: Dict[str, Any], force: bool = False) -> List[int]:
+    """Sizes whose icon is missing or was made from another source or method"""
+    stale = []
+    for size in ICON_SIZES:
+        entry = lock.get(os.path.basename(icon_path(size)))
+        if (force or entry is None or not os.path.exists(icon_path(size))
+                or entry.get('source') != source_hash or entry.get('size') != size
+                or entry.get('method') != method):
+            stale.append(size)
+    return stale
+
+def manifest_icons(manifest_path: str) -> List[Dict[str, str]]:
+    """manifest.json "icons" entries, with paths relative to the manifest"""
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    return [{
+        'src': os.path.relpath(os.path.abspath(icon_path(size)), base).replace(os.sep, '/'),
+        'sizes': f"{size}x{size}",
+        'type': 'image/png',
+        'purpose': 'any',
+    } for size in ICON_SIZES]
+
+def write_manifest(manifest_path: str):
+    """Set the "icons" of a web app manifest, creating the file if needed"""
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {}
+    manifest['icons'] = manifest_icons(manifest_path)
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print(f"Updated icons in {manifest_path}")
+
+def generate_icons(downscale_from_largest: bool = False, force: bool = False,
+                   workers: Optional[int] = None) -> List[str]:
+    """Generate PNG icons from SVG source; returns the icons written"""
     # Ensure the icons directory exists
-    os.makedirs("static/icons", exist_ok=True)
-    
+    os.makedirs(ICON_DIR, exist_ok=True)
+
     # Check if the source SVG exists
-    svg_path = "static/icons/icon-192x192.svg"
-    if not os.path.exists(svg_path):
-        print(f"Error: Source SVG not found at {svg_path}")
-        return
-    
-    # Generate icons for each size
-    for size in ICON_SIZES:
-        output_path = f"static/icons/icon-{size}x{size}.png"
+    if not os.path.exists(SVG_PATH):
+        print(f"Error: Source SVG not found at {SVG_PATH}")
+        return []
+
+    method = 'downscale' if downscale_from_largest else 'render'
+    source_hash = file_hash(SVG_PATH)
+    lock = load_lock()
+    sizes = stale_sizes(source_hash, method, lock, force)
+    if not sizes:
+        print("Icons are up to date")
+        return []
+
+    try:
+        import cairosvg  # noqa: F401 (checked here, used in the workers)
+    except ImportError:
+        print("Error: cairosvg not installed. Please install with: pip install cairosvg")
+        print("Or use another tool to convert the SVG to PNG in the required sizes.")
+        sys.exit(1)
+
+    written = []
+    if downscale_from_largest:
         try:
-            cairosvg.svg2png(url=svg_path, write_to=output_path, output_width=size, output_height=size)
-            print(f"Generated: {output_path}")
-        except Exception as e:
-            print(f"Error generating {output_path}: {e}")
+            written = downscale(SVG_PATH, sizes)
+        except ImportError:
+            print("Error: --downscale needs Pillow. Please install with: pip install Pillow")
+            sys.exit(1)
+    else:
+        # Generate icons for each size, in parallel
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(sizes))) as pool:
+            futures = {size: pool.submit(render, SVG_PATH, size, icon_path(size)) for size in sizes}
+        for size, future in futures.items():
+            try:
+                future.result()
+                written.append(size)
+            except Exception as e:
+                print(f"Error generating {icon_path(size)}: {e}")
+
+    for size in written:
+        lock[os.path.basename(icon_path(size))] = {'source': source_hash, 'size': size, 'method': method}
+        print(f"Generated: {icon_path(size)}")
+    save_lock(lock)
+    return [icon_path(size) for size in written]
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate PWA icons from SVG source")
+    parser.add_argument("--downscale", action="store_true",
+                        help="render once at 512px and resample the smaller sizes (needs Pillow)")
+    parser.add_argument("--force", action="store_true", help="regenerate icons even if unchanged")
+    parser.add_argument("--workers", type=int, help="render processes (default: one per CPU)")
+    parser.add_argument("--manifest", help="manifest.json whose icon entries to write")
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     print("Generating PWA icons...")
-    generate_icons()
-    print("Done!")
\ No newline at end of file
+    generate_icons(args.downscale, args.force, args.workers)
+    if args.manifest:
+        write_manifest(args.manifest)
+    print("Done!")
+
+if __name__ == "__main__":
+    main()
@@ -1,264 +1,206 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime, date
-import json
 import os
+import time
+import math
 from typing import Dict, List, Any
 
-# Page configuration
-st.set_page_config(
-    page_title="Handy - Goals Tracking App",
-    page_icon="🎯",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# Custom CSS with mobile enhancements
-st.markdown("""
-<style>
-    /* Base styles */
-    .main-header {
-        text-align: center;
-        color: #2E86AB;
-        font-size: 3em;
-        font-weight: bold;
-        margin-bottom: 0.5em;
-    }
-    .sub-header {
-        text-align: center;
-        color: #666;
-        font-size: 1.2em;
-        margin-bottom: 2em;
-    }
-    .life-area-card {
-        background: #f8f9fa;
-        padding: 1em;
-        border-radius: 10px;
-        border-left: 5px solid #2E86AB;
-        margin: 1em 0;
-        box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-    }
-    .goal-card {
-        background: #e3f2fd;
-        padding: 1em;
-        border-radius: 8px;
-        margin: 0.5em 0;
-        box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-    }
-    .affirmation-card {
-        background: #f3e5f5;
-        padding: 1em;
-        border-radius: 8px;
-        margin: 0.5em 0;
-        box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-    }
-    
-    /* Mobile-specific styles */
-    @media (max-width: 768px) {
-        /* Text size adjustments */
-        .main-header {
-            font-size: 2em;
-        }
-        .sub-header {
-            font-size: 1em;
-        }
-        
-        /* Make buttons more tappable on mobile */
-        button, .stButton > button {
-            min-height: 44px !important;
-            width: 100% !important;
-            margin: 0.5em 0 !important;
-        }
-        
-        /* Prevent zoom on input fields in iOS */
-        input, textarea, select, .stTextInput > div > div > input, .stTextArea > div > div > textarea {
-            font-size: 16px !important;
-        }
-        
-        /* Improve mobile layout */
-        .row-widget.stRadio > div {
-            flex-direction: column;
-        }
-        
-        /* Adjust column layout for mobile */
-        .row-widget.stHorizontal {
-            flex-wrap: wrap;
-        }
-        
-        /* Make checkboxes and radio buttons more tappable */
-        .stCheckbox label, .stRadio label {
-            min-height: 44px;
-            display: flex;
-            align-items: center;
-            padding: 0.5em 0;
-        }
-        
-        /* Adjust metrics for mobile */
-        [data-testid="stMetricValue"] {
-            font-size: 1.5rem !important;
-        }
-        
-        /* Adjust sliders for mobile */
-        .stSlider {
-            padding: 1em 0 !important;
-        }
-        
-        /* Adjust selectbox for mobile */
-        .stSelectbox {
-            min-height: 44px;
-        }
-        
-        /* Adjust multiselect for mobile */
-        .stMultiSelect {
-            min-height: 44px;
-        }
-        
-        /* Adjust date input for mobile */
-        .stDateInput {
-            min-height: 44px;
-        }
-        
-        /* Adjust number input for mobile */
-        .stNumberInput {
-            min-height: 44px;
-        }
-        
-        /* Adjust text input for mobile */
-        .stTextInput {
-            min-height: 44px;
-        }
-        
-        /* Adjust text area for mobile */
-        .stTextArea {
-            min-height: 44px;
-        }
-        
-        /* Adjust sidebar for mobile */
-        section[data-testid="stSidebar"] {
-            width: 100% !important;
-            min-width: 100% !important;
-            max-width: 100% !important;
-        }
-        
-        /* Adjust expander for mobile */
-        .streamlit-expanderHeader {
-            min-height: 44px;
-        }
-    }
-    
-    /* Hide Streamlit branding for cleaner look */
-    #MainMenu, footer, header {
-        visibility: hidden;
-    }
-    
-    /* Add some padding at the bottom for mobile */
-    .main .block-container {
-        padding-bottom: 80px;
-    }
-    
-    /* Mobile navigation bar */
-    .mobile-nav-bar {
-        display: none;
-    }
+import storage
+import ratings
+from ratings import RatingStore, RatingIndex
+from aggregates import DashboardAggregates
+from tracking import ChangeTracker
+from autosave import AutosaveWorker, DEBOUNCE_SECONDS, BATCH_SIZE
+import charts
+import data_io
+import assets
+import navbar
+import debug
+import metrics
+from analytics import AdherenceAnalytics, ADHERENCE_THRESHOLD
+
+def setup_page():
+    """Page configuration and styles; the first Streamlit calls of every run"""
+    st.set_page_config(
+        page_title="Handy - Goals Tracking App",
+        page_icon="🎯",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
     
-    @media (max-width: 768px) {
-        .mobile-nav-bar {
-            position: fixed;
-            bottom: 0;
-            left: 0;
-            right: 0;
-            background-color: white;
-            box-shadow: 0 -2px 10px rgba(0,0,0,0.1);
-            display: flex;
-            justify-content: space-around;
-            padding: 10px 0;
-            z-index: 1000;
-        }
-        
-        .nav-item {
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-            font-size: 0.7rem;
-            color: #666;
-            text-decoration: none;
-        }
-        
-        .nav-icon {
-            font-size: 1.5rem;
-            margin-bottom: 4px;
-        }
-        
-        .active {
-            color: #2E86AB;
-            font-weight: bold;
-        }
-    }
-</style>
-""", unsafe_allow_html=True)
+    # Custom CSS with mobile enhancements (static/handy.css, downloaded once per client)
+    st.markdown(assets.stylesheet_tag("handy.css"), unsafe_allow_html=True)
+
+# Partial reruns: st.fragment (or st.experimental_fragment) where this Streamlit has it,
+# otherwise a plain call that reruns with the rest of the script
+fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
 
 # Add mobile detection
 is_mobile = True  # Default to mobile-friendly layout for all devices
-if 'is_mobile_checked' not in st.session_state:
-    # This is a simple way to try to detect mobile devices
-    # A more robust solution would use a proper user-agent parser
-    user_agent = st.experimental_get_query_params().get('ua', [''])[0].lower()
-    is_mobile_device = any(device in user_agent for device in ['mobile', 'android', 'iphone', 'ipad', 'ipod'])
-    st.session_state.is_mobile_device = is_mobile_device
-    st.session_state.is_mobile_checked = True
-else:
-    is_mobile_device = st.session_state.is_mobile_device
+
+def detect_mobile_device():
+    """Whether the browser looks like a mobile device (checked once per session)"""
+    if 'is_mobile_checked' not in st.session_state:
+        # This is a simple way to try to detect mobile devices
+        # A more robust solution would use a proper user-agent parser
+        user_agent = st.experimental_get_query_params().get('ua', [''])[0].lower()
+        st.session_state.is_mobile_device = any(device in user_agent for device in ['mobile', 'android', 'iphone', 'ipad', 'ipod'])
+        st.session_state.is_mobile_checked = True
+    return st.session_state.is_mobile_device
+
+# App pages and their nav bar icons
+PAGES = ["Welcome", "Profile Setup", "Goals", "Affirmations", "Daily Reflection", "Dashboard"]
+PAGE_ICONS = ["🏠", "👤", "🎯", "💭", "🌅", "📊"]
 
 # Add mobile navigation bar to all pages
 def add_mobile_navbar(current_page):
     if is_mobile:
-        pages = ["Welcome", "Profile Setup", "Goals", "Affirmations", "Daily Reflection", "Dashboard"]
-        icons = ["🏠", "👤", "🎯", "💭", "🌅", "📊"]
-        
-        nav_html = """
-        <div class="mobile-nav-bar">
-        """
-        
-        for i, page in enumerate(pages):
-            active_class = "active" if page == current_page else ""
-            nav_html += f"""
-            <a href="javascript:void(0);" onclick="navigateToPage('{page}')" class="nav-item {active_class}">
-                <div class="nav-icon">{icons[i]}</div>
-                <div>{page.split(' ')[0]}</div>
-            </a>
-            """
-        
-        nav_html += """
-        </div>
-        
-        <script>
-        function navigateToPage(page) {
-            // Update session state via query parameters
-            const url = new URL(window.location.href);
-            url.searchParams.set('page', page);
-            window.location.href = url.toString();
-        }
-        </script>
-        """
-        
-        st.markdown(nav_html, unsafe_allow_html=True)
+        navbar.mobile_navbar(PAGES, PAGE_ICONS, current_page)
 
 # Data persistence functions
+def get_storage_backend():
+    """Return the storage backend for this session (see storage.backend_from_env)"""
+    if 'storage_backend' not in st.session_state:
+        st.session_state.storage_backend = storage.backend_from_env()
+    return st.session_state.storage_backend
+
 def load_user_data():
-    """Load user data from session state or initialize empty data"""
+    """Load user data from session state, reading sections from storage on first access"""
     if 'user_data' not in st.session_state:
-        st.session_state.user_data = {
-            'profile': {},
-            'life_areas': {},
-            'goals': {},
-            'affirmations': {},
-            'daily_reflections': {}
-        }
-    return st.session_state.user_data
+        st.session_state.user_data = get_storage_backend().load(USER_ID)
+        st.session_state.saved_data_version = st.session_state.get('data_version', 0)
+    user_data = st.session_state.user_data
+    if ratings.needs_migration(user_data):
+        ratings.migrate_affirmation_ids(user_data)
+        bump_data_version()
+        save_user_data(user_data)
+    return user_data
 
-def save_user_data(data):
-    """Save user data to session state"""
+def save_user_data(data, flush=True):
+    """Save user data to session state and persist the rows changed since the last save
+
+    With a persistent backend the rows are written by the autosave worker, so
+    the script never waits on storage; ``flush`` writes them without debouncing.
+    """
+    if data is not st.session_state.get('user_data'):
+        bump_data_version()
     st.session_state.user_data = data
+    tracker = get_change_tracker()
+    version = st.session_state.get('data_version', 0)
+    # Replaced, imported or migrated data is written in full rather than by dirty rows
+    full = st.session_state.get('saved_data_version') != version
+    worker = get_autosave_worker()
+    start = time.perf_counter()
+    if worker is None:
+        get_storage_backend().save(USER_ID, data, None if full else tracker.dirty)
+    elif full:
+        worker.submit_all(data, flush)
+    else:
+        worker.submit(data, tracker.dirty, flush)
+    observer = getattr(data, 'observer', None)
+    if observer is not None:
+        observer('save' if worker is None else 'queue', None, time.perf_counter() - start)
+    st.session_state.saved_data_version = version
+    tracker.mark_saved()
+
+def autosave(user_data):
+    """Queue the rows edited in this run for a debounced background write"""
+    if get_change_tracker().dirty and get_autosave_worker() is not None:
+        save_user_data(user_data, flush=False)
+
+def get_autosave_worker():
+    """Return this session's autosave worker, or None for the in-memory backend"""
+    backend = get_storage_backend()
+    if not isinstance(backend, storage.RowStorageBackend):
+        return None
+    worker = st.session_state.get('autosave_worker')
+    if worker is None or not worker.running():
+        if worker is not None:
+            # Stopped when the browser disconnected; this is a reconnected session.
+            # Its final write finishes before the new worker writes anything.
+            worker.stop()
+        worker = st.session_state.autosave_worker = AutosaveWorker(
+            backend, USER_ID, AUTOSAVE_DEBOUNCE, AUTOSAVE_BATCH_SIZE, alive=session_alive_check())
+    return worker
+
+def session_alive_check():
+    """Return a callable telling whether this browser session is still connected, if Streamlit exposes it"""
+    try:
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        session_id = get_script_run_ctx().session_id
+        runtime = Runtime.instance()
+    except (ImportError, AttributeError, RuntimeError):
+        return None
+    return lambda: runtime.is_active_session(session_id)
+
+def storage_observer(debug_stats=None):
+    """Callable recording storage latency to the metrics and the debug panel, or None if both are off"""
+    if not metrics.enabled:
+        return debug_stats.record_storage if debug_stats else None
+    def observe(operation, section, seconds):
+        metrics.observe('handy_storage_seconds', seconds, operation=operation, section=section or 'all')
+        if debug_stats:
+            debug_stats.record_storage(operation, section, seconds)
+    return observe
+
+def start_metrics():
+    """Start the metrics endpoint / trace if configured (once per process) and count this session"""
+    if not metrics.enabled:
+        metrics.start_from_env()
+        if metrics.enabled:
+            metrics.REGISTRY.gauge('handy_sessions_active', active_sessions, "Connected browser sessions")
+    if metrics.enabled and 'metrics_session' not in st.session_state:
+        st.session_state.metrics_session = True
+        metrics.increment('handy_sessions_started_total')
+
+def active_sessions():
+    """Number of connected sessions, if this Streamlit exposes it"""
+    try:
+        from streamlit.runtime import Runtime
+        return Runtime.instance()._session_mgr.num_active_sessions()
+    except (ImportError, AttributeError, RuntimeError):
+        return None
+
+def get_change_tracker():
+    """Return the tracker recording which rows of the user data were edited this session"""
+    if 'change_tracker' not in st.session_state:
+        st.session_state.change_tracker = ChangeTracker()
+    return st.session_state.change_tracker
+
+def bump_data_version():
+    """Invalidate everything derived from the user data (rating store, dashboard aggregates)"""
+    st.session_state.data_version = st.session_state.get('data_version', 0) + 1
+
+def get_derived(name, build):
+    """Return a per-session structure derived from user data, rebuilt when the data version changes"""
+    version = st.session_state.get('data_version', 0)
+    if st.session_state.get(f"{name}_version") != version:
+        st.session_state[name] = build()
+        st.session_state[f"{name}_version"] = version
+    return st.session_state[name]
+
+def get_rating_store(user_data):
+    """Return the columnar rating store for the current reflections, building it on first use"""
+    return get_derived('rating_store', lambda: RatingStore.from_reflections(user_data['daily_reflections']))
+
+def get_rating_index(user_data):
+    """Return the affirmation ID -> ratings index for the current reflections"""
+    return get_derived('rating_index', lambda: RatingIndex.from_reflections(user_data['daily_reflections']))
+
+def get_dashboard_aggregates(user_data):
+    """Return the dashboard aggregates, building them from scratch only after a data version change"""
+    return get_derived('dashboard_aggregates', lambda: DashboardAggregates.from_user_data(user_data))
+
+def get_adherence_analytics(user_data):
+    """Return streak and moving-average analytics over the rating store"""
+    return get_derived('adherence_analytics', lambda: AdherenceAnalytics(get_rating_store(user_data)))
+
+def cached_derived(name):
+    """Return a derived structure if it is built and current (for incremental updates), else None"""
+    if st.session_state.get(f"{name}_version") == st.session_state.get('data_version', 0):
+        return st.session_state.get(name)
+    return None
 
 # Life areas from the PDF
 LIFE_AREAS = [
@@ -270,6 +212,13 @@ LIFE_AREAS = [
     "Money & finances"
 ]
 
+# User whose data this app instance reads and writes
+USER_ID = os.environ.get('HANDY_USER_ID', 'default')
+
+# Autosave: seconds of inactivity before edits are written, and pending rows that force a write
+AUTOSAVE_DEBOUNCE = float(os.environ.get('HANDY_AUTOSAVE_DEBOUNCE', DEBOUNCE_SECONDS))
+AUTOSAVE_BATCH_SIZE = int(os.environ.get('HANDY_AUTOSAVE_BATCH_SIZE', BATCH_SIZE))
+
 # Common hobbies list
 COMMON_HOBBIES = [
     "Reading", "Sports", "Music", "Travel", "Cooking", "Photography", 
@@ -277,12 +226,34 @@ COMMON_HOBBIES = [
     "Yoga", "Learning languages", "Volunteering", "Technology"
 ]
 
+# Items shown per page in long lists (goals per area, affirmations, ratings)
+PAGE_SIZE = int(os.environ.get('HANDY_PAGE_SIZE', 10))
+PAGE_SIZE_OPTIONS = sorted({5, 10, 25, 50, PAGE_SIZE})
+
+def paginate(items, key):
+    """Render page controls for a list and return the (index, item) pairs on the current page"""
+    page_size = st.session_state.get('page_size', PAGE_SIZE)
+    pages = max(1, math.ceil(len(items) / page_size))
+    page_key = f"page_{key}"
+    # The page lives in session state, so the widget takes no value= (Streamlit
+    # warns about a widget with both) and can be clamped when the list shrinks
+    if st.session_state.get(page_key, 1) > pages or page_key not in st.session_state:
+        st.session_state[page_key] = min(st.session_state.get(page_key, 1), pages)
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=page_key)
+    start = (page - 1) * page_size
+    return [(i, items[i]) for i in range(start, min(start + page_size, len(items)))]
+
 def main():
+    setup_page()
+    start_metrics()
+    is_mobile_device = detect_mobile_device()
     user_data = load_user_data()
     
-    # Check for page parameter in URL (for mobile navigation)
+    # Check for page parameter in URL (links opened from outside the app)
     params = st.experimental_get_query_params()
-    if 'page' in params and params['page'][0] in ["Welcome", "Profile Setup", "Goals", "Affirmations", "Daily Reflection", "Dashboard"]:
+    if 'page' in params and params['page'][0] in PAGES:
         st.session_state.page = params['page'][0]
         # Clear the parameter to avoid loops
         st.experimental_set_query_params()
@@ -291,54 +262,74 @@ def main():
     if 'page' not in st.session_state:
         st.session_state.page = "Welcome"
     
+    # A tap in the mobile nav bar during the previous run
+    tapped = navbar.tapped_page()
+    if tapped in PAGES:
+        st.session_state.page = tapped
+    
     # Sidebar navigation
     st.sidebar.title("🎯 Handy Navigation")
     
     page = st.sidebar.selectbox(
         "Choose a section:",
-        ["Welcome", "Profile Setup", "Goals", "Affirmations", "Daily Reflection", "Dashboard"],
-        index=["Welcome", "Profile Setup", "Goals", "Affirmations", "Daily Reflection", "Dashboard"].index(st.session_state.page)
+        PAGES,
+        index=PAGES.index(st.session_state.page)
     )
     
     # Update session state when selection changes
     st.session_state.page = page
     
-    # Add mobile detection message (only visible in development)
-    if st.sidebar.checkbox("Show Debug Info", False):
+    st.sidebar.selectbox("Items per page:", PAGE_SIZE_OPTIONS,
+                         index=PAGE_SIZE_OPTIONS.index(PAGE_SIZE), key='page_size')
+    
+    unsaved = len(get_change_tracker().dirty)
+    if unsaved:
+        st.sidebar.caption(f"✏️ {unsaved} unsaved change{'s' if unsaved != 1 else ''}")
+    
+    st.session_state.reruns = st.session_state.get('reruns', 0) + 1
+    
+    # Profiling panel (only visible in development); filled in after the page has rendered
+    show_debug = st.sidebar.checkbox("Show Debug Info", False)
+    if show_debug:
         st.sidebar.info("📱 Mobile-friendly mode active")
-        st.sidebar.write(f"Session state: {st.session_state}")
+        debug_panel = st.sidebar.empty()
+        if 'debug_stats' not in st.session_state:
+            st.session_state.debug_stats = debug.DebugStats()
+        debug_stats = st.session_state.debug_stats
+        started = time.perf_counter()
+    if hasattr(user_data, 'observer'):
+        user_data.observer = storage_observer(debug_stats if show_debug else None)
         
     # Set the initial sidebar state based on device
     if is_mobile_device:
-        st.sidebar.markdown("""
-        <style>
-        /* Auto-collapse sidebar on mobile */
-        @media (max-width: 768px) {
-            section[data-testid="stSidebar"][aria-expanded="true"] {
-                display: none !important;
-            }
-        }
-        </style>
-        """, unsafe_allow_html=True)
-    
-    if page == "Welcome":
-        welcome_page()
-        add_mobile_navbar(page)
-    elif page == "Profile Setup":
-        profile_setup(user_data)
-        add_mobile_navbar(page)
-    elif page == "Goals":
-        goals_page(user_data)
-        add_mobile_navbar(page)
-    elif page == "Affirmations":
-        affirmations_page(user_data)
-        add_mobile_navbar(page)
-    elif page == "Daily Reflection":
-        daily_reflection_page(user_data)
-        add_mobile_navbar(page)
-    elif page == "Dashboard":
-        dashboard_page(user_data)
-        add_mobile_navbar(page)
+        st.sidebar.markdown(assets.stylesheet_tag("mobile.css"), unsafe_allow_html=True)
+    
+    # Fixed to the bottom of the screen, so it can be rendered before the page
+    add_mobile_navbar(page)
+    
+    metrics.increment('handy_reruns_total', page=page)
+    with metrics.timed('handy_page_render_seconds', page=page):
+        if page == "Welcome":
+            welcome_page()
+        elif page == "Profile Setup":
+            profile_setup(user_data)
+        elif page == "Goals":
+            goals_page(user_data)
+        elif page == "Affirmations":
+            affirmations_page(user_data)
+        elif page == "Daily Reflection":
+            daily_reflection_page(user_data)
+        elif page == "Dashboard":
+            dashboard_page(user_data)
+    
+    autosave(user_data)
+    
+    if show_debug:
+        debug_stats.record_render(page, (time.perf_counter() - started) * 1000)
+        worker = get_autosave_worker()
+        debug.render_panel(debug_panel, debug_stats, st.session_state, st.session_state.reruns,
+                           worker.last_write if worker else None,
+                           (st.session_state.get('data_version', 0), get_change_tracker().version))
 
 def welcome_page():
     """Welcome and introduction page"""
@@ -347,7 +338,7 @@ def welcome_page():
     
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
-        st.image("https://via.placeholder.com/400x300/2E86AB/FFFFFF?text=Handy+App", use_column_width=True)
+        st.markdown(assets.image_tag("handy.svg", "Handy App"), unsafe_allow_html=True)
     
     st.markdown("---")
     
@@ -427,8 +418,9 @@ def profile_setup(user_data):
     st.subheader("Order these life areas by importance to you")
     st.markdown("Drag and drop or use the interface below to prioritize:")
     
+    tracker = get_change_tracker()
     if 'life_area_priority' not in user_data['profile']:
-        user_data['profile']['life_area_priority'] = LIFE_AREAS.copy()
+        tracker.assign(user_data['profile'], 'life_area_priority', LIFE_AREAS.copy(), 'profile', 'life_area_priority')
     
     prioritized_areas = []
     for i, area in enumerate(LIFE_AREAS):
@@ -447,12 +439,13 @@ def profile_setup(user_data):
     
     # Save profile data
     if st.button("Save Profile"):
-        user_data['profile'].update({
+        for field, value in {
             'job': job,
             'hobbies': selected_hobbies,
             'life_area_priority': sorted_areas,
             'setup_completed': True
-        })
+        }.items():
+            tracker.assign(user_data['profile'], field, value, 'profile', field)
         save_user_data(user_data)
         st.success("Profile saved successfully! 🎉")
         st.balloons()
@@ -471,61 +464,9 @@ def goals_page(user_data):
     if 'goals' not in user_data:
         user_data['goals'] = {}
     
+    # Each area is its own rerun unit, so editing one area leaves the rest of the page alone
     for area in life_areas:
-        st.markdown(f'<div class="life-area-card">', unsafe_allow_html=True)
-        st.subheader(f"📋 {area}")
-        
-        # Current situation description
-        current_situation_key = f"{area}_current"
-        current_situation = st.text_area(
-            "Describe your current situation:",
-            value=user_data['goals'].get(current_situation_key, ''),
-            key=current_situation_key,
-            height=100
-        )
-        user_data['goals'][current_situation_key] = current_situation
-        
-        # Goals for this area
-        if area not in user_data['goals']:
-            user_data['goals'][area] = []
-        
-        st.markdown("**Your Goals:**")
-        
-        # Display existing goals
-        for i, goal in enumerate(user_data['goals'][area]):
-            with st.expander(f"Goal {i+1}: {goal.get('title', 'Untitled')}"):
-                goal_title = st.text_input(f"Goal Title:", value=goal.get('title', ''), key=f"goal_title_{area}_{i}")
-                goal_why = st.text_area(f"Why is this important?", value=goal.get('why', ''), key=f"goal_why_{area}_{i}")
-                goal_how = st.text_area(f"How will you achieve it?", value=goal.get('how', ''), key=f"goal_how_{area}_{i}")
-                empowering_beliefs = st.text_area(f"Empowering beliefs:", value=goal.get('empowering_beliefs', ''), key=f"goal_emp_{area}_{i}")
-                limiting_beliefs = st.text_area(f"Limiting beliefs:", value=goal.get('limiting_beliefs', ''), key=f"goal_lim_{area}_{i}")
-                
-                # Update goal
-                user_data['goals'][area][i] = {
-                    'title': goal_title,
-                    'why': goal_why,
-                    'how': goal_how,
-                    'empowering_beliefs': empowering_beliefs,
-                    'limiting_beliefs': limiting_beliefs
-                }
-                
-                if st.button(f"Remove Goal {i+1}", key=f"remove_goal_{area}_{i}"):
-                    user_data['goals'][area].pop(i)
-                    st.experimental_rerun()
-        
-        # Add new goal
-        if st.button(f"➕ Add Goal for {area}", key=f"add_goal_{area}"):
-            new_goal = {
-                'title': '',
-                'why': '',
-                'how': '',
-                'empowering_beliefs': '',
-                'limiting_beliefs': ''
-            }
-            user_data['goals'][area].append(new_goal)
-            st.experimental_rerun()
-        
-        st.markdown('</div>', unsafe_allow_html=True)
+        goal_area_section(user_data, area)
         st.markdown("---")
     
     # Save goals
@@ -533,6 +474,84 @@ def goals_page(user_data):
         save_user_data(user_data)
         st.success("Goals saved successfully!")
 
+@fragment
+def goal_area_section(user_data, area):
+    """Current situation, goals and add/remove controls of one life area"""
+    st.markdown(f'<div class="life-area-card">', unsafe_allow_html=True)
+    st.subheader(f"📋 {area}")
+    
+    # Current situation description
+    tracker = get_change_tracker()
+    current_situation_key = f"{area}_current"
+    current_situation = st.text_area(
+        "Describe your current situation:",
+        value=user_data['goals'].get(current_situation_key, ''),
+        key=current_situation_key,
+        height=100
+    )
+    tracker.assign(user_data['goals'], current_situation_key, current_situation, 'goal_situations', area)
+    
+    # Goals for this area
+    if area not in user_data['goals']:
+        user_data['goals'][area] = []
+    
+    st.markdown("**Your Goals:**")
+    
+    # Display existing goals
+    # Add and remove run as button callbacks, before the fragment reruns, so the
+    # click needs no st.rerun (which reruns the whole app on older Streamlit)
+    for i, goal in paginate(user_data['goals'][area], f"goals_{area}"):
+        with st.expander(f"Goal {i+1}: {goal.get('title', 'Untitled')}"):
+            goal_editor(user_data, area, i)
+            st.button(f"Remove Goal {i+1}", key=f"remove_goal_{area}_{i}",
+                      on_click=remove_goal, args=(user_data, area, i))
+    
+    aggregates = cached_derived('dashboard_aggregates')
+    if aggregates:
+        aggregates.update_goals(area, user_data['goals'][area])
+    
+    # Add new goal
+    st.button(f"➕ Add Goal for {area}", key=f"add_goal_{area}", on_click=add_goal, args=(user_data, area))
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+    autosave(user_data)
+
+def add_goal(user_data, area):
+    new_goal = {
+        'title': '',
+        'why': '',
+        'how': '',
+        'empowering_beliefs': '',
+        'limiting_beliefs': ''
+    }
+    user_data['goals'][area].append(new_goal)
+    get_change_tracker().mark('goals', area)
+
+def remove_goal(user_data, area, i):
+    user_data['goals'][area].pop(i)
+    get_change_tracker().mark('goals', area)
+
+def goal_editor(user_data, area, i):
+    """Fields of one goal, part of its area's fragment"""
+    # Not a fragment itself: on Streamlit 1.33 a nested fragment clears the
+    # area's fragment scope, so the widgets after it rerun the whole app
+    goal = user_data['goals'][area][i]
+    goal_title = st.text_input(f"Goal Title:", value=goal.get('title', ''), key=f"goal_title_{area}_{i}")
+    goal_why = st.text_area(f"Why is this important?", value=goal.get('why', ''), key=f"goal_why_{area}_{i}")
+    goal_how = st.text_area(f"How will you achieve it?", value=goal.get('how', ''), key=f"goal_how_{area}_{i}")
+    empowering_beliefs = st.text_area(f"Empowering beliefs:", value=goal.get('empowering_beliefs', ''), key=f"goal_emp_{area}_{i}")
+    limiting_beliefs = st.text_area(f"Limiting beliefs:", value=goal.get('limiting_beliefs', ''), key=f"goal_lim_{area}_{i}")
+    
+    # Update goal (only marked dirty if a field changed)
+    get_change_tracker().assign(user_data['goals'][area], i, {
+        'title': goal_title,
+        'why': goal_why,
+        'how': goal_how,
+        'empowering_beliefs': empowering_beliefs,
+        'limiting_beliefs': limiting_beliefs
+    }, 'goals', area, i)
+    autosave(user_data)
+
 def affirmations_page(user_data):
     """Affirmations management page"""
     st.title("💭 Affirmations")
@@ -557,43 +576,71 @@ def affirmations_page(user_data):
     # Display existing affirmations
     st.subheader("Your Affirmations")
     
-    for i, affirmation in enumerate(user_data['affirmations']):
-        col1, col2, col3 = st.columns([3, 1, 1])
+    # Listed in priority order; priorities are kept as 1..N so moving an item swaps two neighbours
+    tracker = get_change_tracker()
+    positions = {aff['id']: j for j, aff in enumerate(user_data['affirmations'])}
+    sorted_affirmations = sorted(user_data['affirmations'], key=lambda x: x.get('priority', 999))
+    for priority, affirmation in enumerate(sorted_affirmations, 1):
+        tracker.assign(affirmation, 'priority', priority, 'affirmations', positions[affirmation['id']])
+    
+    for i, affirmation in paginate(sorted_affirmations, 'affirmations'):
+        aff_id = affirmation['id']
+        col1, col2, col3, col4 = st.columns([6, 1, 1, 1])
         
         with col1:
             updated_text = st.text_input(f"Affirmation {i+1}:", 
                                        value=affirmation.get('text', ''), 
-                                       key=f"aff_text_{i}")
-            user_data['affirmations'][i]['text'] = updated_text
+                                       key=f"aff_text_{aff_id}")
+            tracker.assign(affirmation, 'text', updated_text, 'affirmations', positions[aff_id])
         
         with col2:
-            priority = st.selectbox("Priority", 
-                                  range(1, len(user_data['affirmations']) + 1),
-                                  index=affirmation.get('priority', 1) - 1,
-                                  key=f"aff_priority_{i}")
-            user_data['affirmations'][i]['priority'] = priority
+            if st.button("⬆️", key=f"aff_up_{aff_id}", help="Move up", disabled=i == 0):
+                neighbour = sorted_affirmations[i - 1]
+                affirmation['priority'], neighbour['priority'] = neighbour['priority'], affirmation['priority']
+                tracker.mark('affirmations', positions[aff_id])
+                tracker.mark('affirmations', positions[neighbour['id']])
+                st.experimental_rerun()
         
         with col3:
-            if st.button("🗑️", key=f"delete_aff_{i}", help="Delete affirmation"):
-                user_data['affirmations'].pop(i)
+            if st.button("⬇️", key=f"aff_down_{aff_id}", help="Move down", disabled=i == len(sorted_affirmations) - 1):
+                neighbour = sorted_affirmations[i + 1]
+                affirmation['priority'], neighbour['priority'] = neighbour['priority'], affirmation['priority']
+                tracker.mark('affirmations', positions[aff_id])
+                tracker.mark('affirmations', positions[neighbour['id']])
+                st.experimental_rerun()
+        
+        with col4:
+            if st.button("🗑️", key=f"delete_aff_{aff_id}", help="Delete affirmation"):
+                user_data['affirmations'].pop(positions[aff_id])
+                tracker.mark('affirmations')
                 st.experimental_rerun()
     
+    aggregates = cached_derived('dashboard_aggregates')
+    if aggregates:
+        aggregates.update_affirmations(user_data['affirmations'])
+    
     # Add new affirmation
     st.subheader("Add New Affirmation")
-    col1, col2 = st.columns([3, 1])
+    col1, col2, col3 = st.columns([3, 2, 1])
     
     with col1:
         new_affirmation_text = st.text_input("Enter your affirmation:", key="new_affirmation")
     
     with col2:
+        new_affirmation_area = st.selectbox("Life area:", ["Unassigned"] + LIFE_AREAS, key="new_affirmation_area")
+    
+    with col3:
         if st.button("➕ Add"):
             if new_affirmation_text:
                 new_affirmation = {
+                    'id': ratings.new_affirmation_id(),
                     'text': new_affirmation_text,
+                    'area': new_affirmation_area if new_affirmation_area != "Unassigned" else None,
                     'priority': len(user_data['affirmations']) + 1,
                     'created_date': str(date.today())
                 }
                 user_data['affirmations'].append(new_affirmation)
+                tracker.mark('affirmations', len(user_data['affirmations']) - 1)
                 st.experimental_rerun()
     
     # AI Generation (placeholder)
@@ -612,11 +659,13 @@ def affirmations_page(user_data):
         for sample in sample_affirmations:
             if st.button(f"➕ Add: {sample}", key=f"sample_{sample[:20]}"):
                 new_affirmation = {
+                    'id': ratings.new_affirmation_id(),
                     'text': sample,
                     'priority': len(user_data['affirmations']) + 1,
                     'created_date': str(date.today())
                 }
                 user_data['affirmations'].append(new_affirmation)
+                tracker.mark('affirmations', len(user_data['affirmations']) - 1)
                 st.experimental_rerun()
     
     # Save affirmations
@@ -637,6 +686,13 @@ def daily_reflection_page(user_data):
     if today not in user_data['daily_reflections']:
         user_data['daily_reflections'][today] = {}
     
+    tracker = get_change_tracker()
+    reflection = user_data['daily_reflections'][today]
+    
+    aggregates = cached_derived('dashboard_aggregates')
+    if aggregates:
+        aggregates.update_day(today, reflection)
+    
     st.markdown(f"**Reflection for {datetime.now().strftime('%B %d, %Y')}**")
     
     if not user_data.get('affirmations'):
@@ -650,7 +706,8 @@ def daily_reflection_page(user_data):
     # Sort affirmations by priority
     sorted_affirmations = sorted(user_data['affirmations'], key=lambda x: x.get('priority', 999))
     
-    for i, affirmation in enumerate(sorted_affirmations):
+    for _, affirmation in paginate(sorted_affirmations, 'reflection'):
+        aff_id = affirmation['id']
         st.markdown(f'<div class="affirmation-card">', unsafe_allow_html=True)
         
         col1, col2, col3 = st.columns([3, 1, 1])
@@ -664,19 +721,19 @@ def daily_reflection_page(user_data):
                 "Rating", 
                 min_value=0, 
                 max_value=10, 
-                value=user_data['daily_reflections'][today].get(f"aff_{i}_rating", 5),
-                key=f"rating_{i}_{today}"
+                value=user_data['daily_reflections'][today].get(ratings.rating_key(aff_id), 5),
+                key=f"rating_{aff_id}_{today}"
             )
-            user_data['daily_reflections'][today][f"aff_{i}_rating"] = rating
+            tracker.assign(reflection, ratings.rating_key(aff_id), rating, 'daily_reflections', today)
         
         with col3:
             # Not relevant checkbox
             not_relevant = st.checkbox(
                 "Not relevant (X)", 
-                value=user_data['daily_reflections'][today].get(f"aff_{i}_not_relevant", False),
-                key=f"not_relevant_{i}_{today}"
+                value=user_data['daily_reflections'][today].get(ratings.not_relevant_key(aff_id), False),
+                key=f"not_relevant_{aff_id}_{today}"
             )
-            user_data['daily_reflections'][today][f"aff_{i}_not_relevant"] = not_relevant
+            tracker.assign(reflection, ratings.not_relevant_key(aff_id), not_relevant, 'daily_reflections', today)
         
         st.markdown('</div>', unsafe_allow_html=True)
     
@@ -687,7 +744,7 @@ def daily_reflection_page(user_data):
         value=user_data['daily_reflections'][today].get('notes', ''),
         height=100
     )
-    user_data['daily_reflections'][today]['notes'] = reflection_notes
+    tracker.assign(reflection, 'notes', reflection_notes, 'daily_reflections', today)
     
     # Mood tracking
     st.subheader("😊 Mood")
@@ -697,19 +754,29 @@ def daily_reflection_page(user_data):
         mood_options,
         index=user_data['daily_reflections'][today].get('mood_index', 2)
     )
-    user_data['daily_reflections'][today]['mood'] = mood
-    user_data['daily_reflections'][today]['mood_index'] = mood_options.index(mood)
+    tracker.assign(reflection, 'mood', mood, 'daily_reflections', today)
+    tracker.assign(reflection, 'mood_index', mood_options.index(mood), 'daily_reflections', today)
+    if aggregates:
+        aggregates.update_day(today, user_data['daily_reflections'][today])
     
     # Save reflection
     if st.button("💾 Save Today's Reflection"):
-        user_data['daily_reflections'][today]['completed'] = True
-        user_data['daily_reflections'][today]['completion_time'] = datetime.now().isoformat()
+        tracker.assign(reflection, 'completed', True, 'daily_reflections', today)
+        tracker.assign(reflection, 'completion_time', datetime.now().isoformat(), 'daily_reflections', today)
         save_user_data(user_data)
+        get_rating_store(user_data).record_day(today, user_data['daily_reflections'][today])
+        get_rating_index(user_data).record_day(today, user_data['daily_reflections'][today])
+        adherence = cached_derived('adherence_analytics')
+        if adherence:
+            adherence.record_day(today)
+        if aggregates:
+            aggregates.update_day(today, user_data['daily_reflections'][today])
         st.success("Daily reflection saved! 🌟")
         st.balloons()
 
 def dashboard_page(user_data):
     """Dashboard with overview and analytics"""
+    import pandas as pd
     st.title("📊 Dashboard")
     
     if not user_data['profile'].get('setup_completed'):
@@ -719,55 +786,83 @@ def dashboard_page(user_data):
     # Overview metrics
     col1, col2, col3, col4 = st.columns(4)
     
-    total_goals = sum(len(goals) for goals in user_data.get('goals', {}).values() if isinstance(goals, list))
-    total_affirmations = len(user_data.get('affirmations', []))
-    reflection_days = len(user_data.get('daily_reflections', {}))
+    aggregates = get_dashboard_aggregates(user_data)
     
     with col1:
-        st.metric("🎯 Total Goals", total_goals)
+        st.metric("🎯 Total Goals", aggregates.total_goals)
     
     with col2:
-        st.metric("💭 Affirmations", total_affirmations)
+        st.metric("💭 Affirmations", aggregates.total_affirmations)
     
     with col3:
-        st.metric("📅 Reflection Days", reflection_days)
+        st.metric("📅 Reflection Days", aggregates.reflection_days)
     
     with col4:
-        completion_rate = 0
-        if user_data.get('daily_reflections'):
-            completed_days = sum(1 for day_data in user_data['daily_reflections'].values() 
-                               if day_data.get('completed'))
-            completion_rate = (completed_days / len(user_data['daily_reflections'])) * 100
-        st.metric("✅ Completion Rate", f"{completion_rate:.0f}%")
+        st.metric("✅ Completion Rate", f"{aggregates.completion_rate:.0f}%")
     
     st.markdown("---")
     
     # Goals by life area
     st.subheader("🎯 Goals by Life Area")
-    if user_data.get('goals'):
-        goal_counts = {}
-        for area, goals in user_data['goals'].items():
-            if isinstance(goals, list) and goals:
-                goal_counts[area] = len(goals)
-        
-        if goal_counts:
-            goal_df = pd.DataFrame(list(goal_counts.items()), columns=['Life Area', 'Goal Count'])
-            st.bar_chart(goal_df.set_index('Life Area'))
+    if aggregates.total_goals:
+        st.bar_chart(aggregates.goal_frame())
+    
+    # Chart range and resolution (applies to the trend charts below)
+    col1, col2 = st.columns(2)
+    with col1:
+        chart_range = st.selectbox("Chart range:", list(charts.RANGE_OPTIONS), index=1)
+    with col2:
+        chart_resolution = st.selectbox("Resolution:", list(charts.RESOLUTION_OPTIONS))
+    range_days = charts.RANGE_OPTIONS[chart_range]
+    resample_rule = charts.RESOLUTION_OPTIONS[chart_resolution]
     
     # Recent reflections
     st.subheader("📈 Recent Mood Trends")
-    if user_data.get('daily_reflections'):
-        mood_data = []
-        for date_str, reflection in user_data['daily_reflections'].items():
-            if 'mood_index' in reflection:
-                mood_data.append({
-                    'Date': pd.to_datetime(date_str),
-                    'Mood': reflection['mood_index']
-                })
+    if aggregates.moods:
+        st.line_chart(charts.prepare_series(aggregates.mood_frame(), range_days, resample_rule))
+    
+    # Per-affirmation rating trends
+    st.subheader("📉 Affirmation Ratings")
+    rating_store = get_rating_store(user_data)
+    affirmation_texts = {aff['id']: aff['text'] for aff in user_data.get('affirmations', [])}
+    if rating_store.series and affirmation_texts:
+        sorted_affirmations = sorted(user_data['affirmations'], key=lambda x: x.get('priority', 999))
+        selected_id = st.selectbox(
+            "Rating history for:",
+            [aff['id'] for aff in sorted_affirmations],
+            format_func=lambda aff_id: affirmation_texts[aff_id]
+        )
         
-        if mood_data:
-            mood_df = pd.DataFrame(mood_data).sort_values('Date')
-            st.line_chart(mood_df.set_index('Date'))
+        # Only the selected and the highest-priority affirmations are charted
+        chart_ids = [selected_id] + [aff['id'] for aff in sorted_affirmations
+                                     if aff['id'] != selected_id][:charts.MAX_CHART_SERIES - 1]
+        ratings_df = charts.prepare_series(rating_store.to_frame(chart_ids), range_days, resample_rule)
+        if not ratings_df.columns.empty:
+            st.line_chart(ratings_df.rename(columns=affirmation_texts))
+        history = get_rating_index(user_data).history(selected_id)
+        if history:
+            st.dataframe(pd.DataFrame(history, columns=['Date', 'Rating', 'Not relevant']))
+        
+        adherence = get_adherence_analytics(user_data)
+        
+        # Streaks and moving averages
+        st.subheader("🔥 Affirmation Streaks")
+        st.caption(f"A day counts towards a streak when rated {ADHERENCE_THRESHOLD} or higher; "
+                   "days marked not relevant are skipped.")
+        summary = adherence.summary(sorted_affirmations)
+        if summary:
+            st.dataframe(pd.DataFrame(summary).set_index('Affirmation'))
+        if selected_id in rating_store.series:
+            st.line_chart(charts.prepare_series(adherence.moving_average_frame(selected_id), range_days, None))
+        
+        # Adherence per life area
+        st.subheader("🧭 Adherence by Life Area")
+        area_rates = adherence.area_adherence(user_data['affirmations'])
+        if area_rates:
+            st.bar_chart(pd.DataFrame({'Adherence %': list(area_rates.values())},
+                                      index=pd.Index(list(area_rates), name='Life Area')))
+        else:
+            st.info("Assign a life area to your affirmations to see adherence per area.")
     
     # Profile summary
     st.subheader("👤 Profile Summary")
@@ -791,27 +886,69 @@ def dashboard_page(user_data):
     col1, col2 = st.columns(2)
     
     with col1:
+        export_formats = {
+            'ndjson': "NDJSON (one record per line)",
+            'json': "Compact JSON",
+            'parquet': "Parquet tables (zip)",
+            'arrow': "Arrow IPC tables (zip)",
+        }
+        export_format = st.selectbox("Export format:", list(export_formats), format_func=export_formats.get)
+        columnar = export_format in data_io.COLUMNAR_FORMATS
+        export_compress = False if columnar else st.checkbox("Compress (gzip)", True)
+        export_start = export_end = None
+        if st.checkbox("Only reflections in a date range", False):
+            export_start = st.date_input("From:", date.today().replace(month=1, day=1))
+            export_end = st.date_input("To:", date.today())
+        
         if st.button("📥 Export Data"):
-            # Create downloadable JSON
-            export_data = json.dumps(user_data, indent=2, default=str)
-            st.download_button(
-                label="Download JSON",
-                data=export_data,
-                file_name=f"handy_data_{date.today()}.json",
-                mime="application/json"
-            )
+            try:
+                with metrics.timed('handy_data_io_seconds', operation='export', format=export_format):
+                    if columnar:
+                        # Typed tables that load straight into pandas
+                        export_data = data_io.export_columnar(user_data, export_format, export_start, export_end)
+                        file_name = data_io.columnar_file_name(export_format)
+                        mime = "application/zip"
+                    else:
+                        # Stream the sections through the encoder; only the compressed output is kept
+                        export_data = data_io.export_bytes(user_data, export_format, export_compress,
+                                                           export_start, export_end)
+                        file_name = data_io.export_file_name(export_format, export_compress)
+                        mime = data_io.export_mime(export_format, export_compress)
+            except ImportError as e:
+                st.error(str(e))
+            else:
+                st.download_button(
+                    label="Download Export",
+                    data=export_data,
+                    file_name=file_name,
+                    mime=mime
+                )
     
     with col2:
-        uploaded_file = st.file_uploader("📤 Import Data", type="json")
+        uploaded_file = st.file_uploader("📤 Import Data", type=["json", "ndjson", "gz", "zip"])
         if uploaded_file is not None:
-            try:
-                imported_data = json.load(uploaded_file)
-                if st.button("Confirm Import"):
-                    st.session_state.user_data = imported_data
-                    st.success("Data imported successfully!")
+            if st.button("Confirm Import"):
+                progress_bar = st.progress(0.0)
+                try:
+                    # Everything is parsed and validated before the current data is touched
+                    with metrics.timed('handy_data_io_seconds', operation='import',
+                                       format="columnar" if uploaded_file.name.endswith(".zip") else "json"):
+                        if uploaded_file.name.endswith(".zip"):
+                            imported_data = data_io.read_columnar(uploaded_file)
+                            progress_bar.progress(1.0)
+                        else:
+                            imported_data = data_io.read_import(uploaded_file, uploaded_file.size, progress_bar.progress)
+                except (data_io.ImportValidationError, ImportError) as e:
+                    st.error(f"Import failed, your data was not changed: {e}")
+                else:
+                    if ratings.needs_migration(imported_data):
+                        ratings.migrate_affirmation_ids(imported_data, user_data['affirmations'])
+                    counts = data_io.merge_user_data(user_data, imported_data)
+                    bump_data_version()
+                    save_user_data(user_data)
+                    st.success(f"Data imported successfully! Merged {counts['goals']} goals, "
+                               f"{counts['affirmations']} affirmations and {counts['days']} days.")
                     st.experimental_rerun()
-            except json.JSONDecodeError:
-                st.error("Invalid JSON file")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
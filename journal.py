@@ -0,0 +1,197 @@
+"""
+Append-only event journal backend for Handy user data
+
+Every changed row is appended to ``journal.log`` as a typed event (one JSON
+object per line) and fsynced in batches. A background thread periodically
+folds the journal into ``snapshot.ndjson``; on startup the state is rebuilt
+from the latest snapshot plus the journal tail.
+"""
+
+import glob
+import json
+import os
+import threading
+from typing import Dict, List
+
+from storage import RowStorageBackend, RowKey, SECTION_TABLES, encode_row
+
+# Event types per table: (row added, row edited, row removed)
+EVENT_TYPES = {
+    'profile': ('profile_field_set', 'profile_field_set', 'profile_field_removed'),
+    'life_areas': ('life_area_added', 'life_area_edited', 'life_area_removed'),
+    'goals': ('goal_added', 'goal_edited', 'goal_removed'),
+    'goal_situations': ('situation_added', 'situation_edited', 'situation_removed'),
+    'affirmations': ('affirmation_added', 'affirmation_edited', 'affirmation_removed'),
+    'daily_reflections': ('reflection_started', 'reflection_rated', 'reflection_removed'),
+}
+
+# Event types that delete a row when replayed
+REMOVAL_EVENTS = {removed for _, _, removed in EVENT_TYPES.values()}
+
+JOURNAL_FILE = "journal.log"
+SNAPSHOT_FILE = "snapshot.ndjson"
+
+
+class JournalBackend(RowStorageBackend):
+    """Storage backend that appends change events and compacts them into snapshots"""
+
+    def __init__(self, directory: str, batch_size: int = 64, flush_interval: float = 1.0,
+                 compact_threshold: int = 5000):
+        super().__init__()
+        self.directory = directory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.compact_threshold = compact_threshold
+        os.makedirs(directory, exist_ok=True)
+
+        # user_id -> table -> {row key: stored JSON}
+        self._rows = {}
+        self._seq = 0
+        self._snapshot_seq = 0
+        self._unsynced = 0
+        self._recover()
+        self._journal = open(os.path.join(directory, JOURNAL_FILE), 'a', encoding='utf-8')
+
+        self._stop = threading.Event()
+        self._background = threading.Thread(target=self._run_background, name="handy-journal", daemon=True)
+        self._background.start()
+
+    # Recovery
+
+    def _recover(self):
+        """Rebuild state from the latest snapshot and the journal tail"""
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                self._snapshot_seq = self._seq = header['seq']
+                for line in f:
+                    row = json.loads(line)
+                    key = tuple(row['key'])
+                    self._table(row['user'], key[0])[key] = encode_row(row['value'])
+
+        # Rotated journals (left behind by an interrupted compaction) come before the live one
+        journals = sorted(glob.glob(os.path.join(self.directory, "journal.*.log")))
+        journals.append(os.path.join(self.directory, JOURNAL_FILE))
+        for path in journals:
+            if os.path.exists(path):
+                end = self._replay(path)
+                if os.path.getsize(path) > end:
+                    # Cut off a torn final write, or the next event would be appended to it
+                    # and lost (together with everything after it) on the next recovery
+                    with open(path, 'r+b') as f:
+                        f.truncate(end)
+                        f.flush()
+                        os.fsync(f.fileno())
+
+    def _replay(self, path: str) -> int:
+        """Apply the events of one journal; returns the offset just past its last complete line"""
+        end = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("unterminated line")
+                    event = json.loads(line)
+                except ValueError:
+                    # A torn final write from a crash; everything before it is intact
+                    break
+                end += len(line)
+                if event['seq'] <= self._seq:
+                    continue
+                self._seq = event['seq']
+                key = tuple(event['key'])
+                table = self._table(event['user'], key[0])
+                if event['type'] in REMOVAL_EVENTS:
+                    table.pop(key, None)
+                else:
+                    table[key] = encode_row(event['value'])
+        return end
+
+    def _table(self, user_id: str, table: str) -> Dict[RowKey, str]:
+        return self._rows.setdefault(user_id, {}).setdefault(table, {})
+
+    # Row storage
+
+    def _read_rows(self, user_id: str, section: str) -> Dict[RowKey, str]:
+        rows = {}
+        for table in SECTION_TABLES[section]:
+            rows.update(self._rows.get(user_id, {}).get(table, {}))
+        return rows
+
+    def _write_rows(self, user_id: str, section: str,
+                    upserts: Dict[RowKey, str], deletes: List[RowKey]):
+        lines = []
+        for key in deletes:
+            self._table(user_id, key[0]).pop(key, None)
+            lines.append(self._event(EVENT_TYPES[key[0]][2], user_id, key, 'null'))
+        for key, text in upserts.items():
+            table = self._table(user_id, key[0])
+            kind = 1 if key in table else 0
+            table[key] = text
+            lines.append(self._event(EVENT_TYPES[key[0]][kind], user_id, key, text))
+        self._journal.write("".join(lines))
+        self._unsynced += len(lines)
+        if self._unsynced >= self.batch_size:
+            self._sync()
+
+    def _event(self, event_type: str, user_id: str, key: RowKey, text: str) -> str:
+        """Format one journal line; ``text`` is already-encoded JSON"""
+        self._seq += 1
+        return (f'{{"seq":{self._seq},"type":"{event_type}","user":{json.dumps(user_id)},'
+                f'"key":{json.dumps(list(key))},"value":{text}}}\n')
+
+    def _sync(self):
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._unsynced = 0
+
+    # Background flushing and compaction
+
+    def _run_background(self):
+        while not self._stop.wait(self.flush_interval):
+            with self._lock:
+                if self._unsynced:
+                    self._sync()
+                due = self._seq - self._snapshot_seq >= self.compact_threshold
+            if due:
+                self.compact()
+
+    def compact(self):
+        """Fold the journal into a new snapshot and drop the folded events"""
+        with self._lock:
+            self._sync()
+            self._journal.close()
+            seq = self._seq
+            rotated = os.path.join(self.directory, f"journal.{seq:012d}.log")
+            os.replace(os.path.join(self.directory, JOURNAL_FILE), rotated)
+            self._journal = open(os.path.join(self.directory, JOURNAL_FILE), 'a', encoding='utf-8')
+            state = {user_id: {table: dict(rows) for table, rows in tables.items()}
+                     for user_id, tables in self._rows.items()}
+
+        # Writing the snapshot happens outside the lock so saves are not held up
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        tmp_path = snapshot_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'seq': seq}) + "\n")
+            for user_id, tables in state.items():
+                user = json.dumps(user_id)
+                for rows in tables.values():
+                    for key, text in rows.items():
+                        f.write(f'{{"user":{user},"key":{json.dumps(list(key))},"value":{text}}}\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path)
+
+        with self._lock:
+            self._snapshot_seq = seq
+        for path in glob.glob(os.path.join(self.directory, "journal.*.log")):
+            if int(os.path.basename(path).split('.')[1]) <= seq:
+                os.remove(path)
+
+    def close(self):
+        self._stop.set()
+        self._background.join()
+        with self._lock:
+            self._sync()
+            self._journal.close()
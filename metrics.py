@@ -0,0 +1,234 @@
+"""
+Process-wide timing metrics: histograms, counters and gauges
+
+Enabled by HANDY_METRICS_PORT (serves the Prometheus text format at
+http://HANDY_METRICS_HOST:PORT/metrics, and p50/p95/p99 per series at
+/metrics.json) and/or HANDY_TRACE_FILE (appends one
+JSON line per timed call). When neither is set, ``timed`` is a no-op.
+"""
+
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds: 0.5 ms doubling up to ~33 s
+BUCKETS = tuple(0.0005 * 2 ** i for i in range(17))
+
+# Quantiles reported by snapshot()
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Trace lines buffered before they are written out
+TRACE_BUFFER = 64 * 1024
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Fixed-bucket histogram; quantiles are interpolated within buckets"""
+
+    __slots__ = ('counts', 'count', 'sum', 'lock')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(BUCKETS, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return BUCKETS[-1]
+
+
+class Registry:
+    """Named metric series, each keyed by its sorted labels"""
+
+    def __init__(self):
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        # Gauges are read when metrics are exported
+        self.gauges: Dict[str, Callable[[], Optional[float]]] = {}
+        self.help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, labels: Labels) -> Histogram:
+        series = self.histograms.get(name)
+        if series is None or labels not in series:
+            with self._lock:
+                series = self.histograms.setdefault(name, {})
+                series.setdefault(labels, Histogram())
+        return series[labels]
+
+    def increment(self, name: str, labels: Labels = (), amount: float = 1):
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + amount
+
+    def gauge(self, name: str, read: Callable[[], Optional[float]], help_text: str = ''):
+        self.gauges[name] = read
+        if help_text:
+            self.help[name] = help_text
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Counts, sums and p50/p95/p99 of every histogram series"""
+        result = {}
+        for name, series in list(self.histograms.items()):
+            result[name] = [dict(labels=dict(labels), count=h.count, sum=h.sum,
+                                 **{f"p{int(q * 100)}": h.quantile(q) for q in QUANTILES})
+                            for labels, h in list(series.items())]
+        return result
+
+    def to_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for name, series in sorted(self.histograms.items()):
+            lines += _header(name, 'histogram', self.help.get(name))
+            for labels, h in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, h.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {h.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {h.sum}")
+                lines.append(f"{name}_count{_labels(labels)} {h.count}")
+        for name, series in sorted(self.counters.items()):
+            lines += _header(name, 'counter', self.help.get(name))
+            lines += [f"{name}{_labels(labels)} {value}" for labels, value in sorted(series.items())]
+        for name, read in sorted(self.gauges.items()):
+            value = read()
+            if value is not None:
+                lines += _header(name, 'gauge', self.help.get(name))
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _header(name: str, kind: str, help_text: Optional[str]) -> List[str]:
+    return ([f"# HELP {name} {help_text}"] if help_text else []) + [f"# TYPE {name} {kind}"]
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+REGISTRY = Registry()
+REGISTRY.help.update({
+    'handy_page_render_seconds': "Time to render one page",
+    'handy_storage_seconds': "Time of storage loads and saves",
+    'handy_data_io_seconds': "Time of data imports and exports",
+    'handy_reruns_total': "Script runs per page",
+    'handy_sessions_started_total': "Browser sessions started",
+})
+
+_trace = None
+_trace_lock = threading.Lock()
+_server = None
+_start_lock = threading.Lock()
+enabled = False
+
+
+def observe(name: str, seconds: float, **labels):
+    """Record one timing (no-op unless metrics are enabled)"""
+    if not enabled:
+        return
+    key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+    REGISTRY.histogram(name, key).observe(seconds)
+    if _trace is not None:
+        line = json.dumps({'ts': time.time(), 'name': name, 'seconds': seconds, **labels}, default=str)
+        with _trace_lock:
+            if _trace is not None:
+                _trace.write(line + "\n")
+
+
+def increment(name: str, **labels):
+    if enabled:
+        REGISTRY.increment(name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+
+@contextmanager
+def timed(name: str, **labels):
+    """Time the enclosed block into histogram ``name``"""
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/metrics':
+            body = REGISTRY.to_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif path == '/metrics.json':
+            # Quantiles computed here, for a quick look without a Prometheus server
+            body = json.dumps(REGISTRY.snapshot()).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port: Optional[int] = None, host: str = '127.0.0.1', trace_file: Optional[str] = None):
+    """Enable metrics, serving them on ``port`` and/or tracing to ``trace_file`` (idempotent)"""
+    global enabled, _server, _trace
+    with _start_lock:
+        if port is not None and _server is None:
+            _server = ThreadingHTTPServer((host, port), _Handler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+        if trace_file and _trace is None:
+            _trace = open(trace_file, 'a', buffering=TRACE_BUFFER, encoding='utf-8')
+            atexit.register(_close_trace)
+        enabled = enabled or port is not None or bool(trace_file)
+
+
+def start_from_env():
+    """Start metrics as configured by HANDY_METRICS_PORT, HANDY_METRICS_HOST and HANDY_TRACE_FILE"""
+    port = os.environ.get('HANDY_METRICS_PORT')
+    trace_file = os.environ.get('HANDY_TRACE_FILE')
+    if (port or trace_file) and not enabled:
+        start(int(port) if port else None, os.environ.get('HANDY_METRICS_HOST', '127.0.0.1'), trace_file)
+
+
+def _close_trace():
+    global _trace
+    with _trace_lock:
+        if _trace is not None:
+            _trace.close()
+            _trace = None
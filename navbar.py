@@ -0,0 +1,39 @@
+"""
+Mobile navigation bar component
+
+The bar is a minimal Streamlit component (plain HTML speaking the component
+postMessage protocol, see components/navbar), so a tap sends the page back to
+the running script and switches pages with one rerun of the same session.
+"""
+
+import os
+from typing import List, Optional
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+COMPONENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "navbar")
+
+# Session state key of the component value ({'page': ..., 'tap': ...})
+KEY = "mobile_navbar"
+
+_navbar = components.declare_component("navbar", path=COMPONENT_DIR)
+
+
+def tapped_page(key: str = KEY) -> Optional[str]:
+    """Return the page tapped since the last call, or None
+
+    The component keeps returning its last value on every rerun, so each tap
+    carries an ID and is only handled once.
+    """
+    value = st.session_state.get(key)
+    if not value or value.get('tap') == st.session_state.get(f"{key}_handled"):
+        return None
+    st.session_state[f"{key}_handled"] = value['tap']
+    return value['page']
+
+
+def mobile_navbar(pages: List[str], icons: List[str], current: str, key: str = KEY):
+    """Render the bottom navigation bar with ``current`` highlighted"""
+    _navbar(pages=pages, icons=icons, labels=[page.split(' ')[0] for page in pages],
+            current=current, key=key, default=None)
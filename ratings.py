@@ -0,0 +1,242 @@
+"""
+Columnar storage of daily affirmation ratings
+
+Reflections are stored per day as ``aff_{key}_rating`` / ``aff_{key}_not_relevant``
+entries. RatingStore turns them into one array-backed series per affirmation,
+indexed by day ordinal, so trends can be computed without re-parsing every day.
+Only completed days count: the Daily Reflection page stores its slider
+defaults as soon as it is opened, before the user has rated anything.
+"""
+
+import re
+import uuid
+from array import array
+from datetime import date
+from typing import Dict, List, Iterable, Any, Optional, Tuple
+
+# Value stored for days that have no rating for an affirmation
+NO_RATING = -1
+
+RATING_KEY = re.compile(r"^aff_(.+)_(rating|not_relevant)$")
+
+# Version of the user data layout; 2 keys ratings by affirmation ID instead of position
+SCHEMA_VERSION = 2
+
+
+def new_affirmation_id() -> str:
+    """Return a fresh, stable affirmation ID"""
+    return uuid.uuid4().hex
+
+
+def rating_key(affirmation_id: str) -> str:
+    return f"aff_{affirmation_id}_rating"
+
+
+def not_relevant_key(affirmation_id: str) -> str:
+    return f"aff_{affirmation_id}_not_relevant"
+
+
+def needs_migration(user_data: Dict[str, Any]) -> bool:
+    """Whether the user data predates the current schema version"""
+    return user_data['profile'].get('schema_version', 1) < SCHEMA_VERSION
+
+
+def migrate_affirmation_ids(user_data: Dict[str, Any], existing: Optional[List[Dict[str, Any]]] = None):
+    """One-time migration from positional ``aff_{i}`` rating keys to affirmation IDs
+
+    Affirmations without an ID get one: that of an ``existing`` affirmation
+    with the same text if there is one (so importing an old export again
+    matches what the first import added), otherwise a new one. Positional
+    keys are mapped to the affirmation at that position in the priority-sorted
+    list, which is the order the Daily Reflection page used when the rating
+    was recorded.
+    """
+    ids_by_text: Dict[Any, List[str]] = {}
+    for affirmation in existing or []:
+        if affirmation.get('id'):
+            ids_by_text.setdefault(affirmation.get('text'), []).append(affirmation['id'])
+    affirmations = user_data['affirmations']
+    for affirmation in affirmations:
+        if 'id' not in affirmation:
+            known = ids_by_text.get(affirmation.get('text'))
+            affirmation['id'] = known.pop(0) if known else new_affirmation_id()
+    ordered = sorted(affirmations, key=lambda x: x.get('priority', 999))
+
+    for reflection in user_data['daily_reflections'].values():
+        for name in [name for name in reflection if RATING_KEY.match(name)]:
+            key, field = RATING_KEY.match(name).groups()
+            if not key.isdigit():
+                continue
+            value = reflection.pop(name)
+            position = int(key)
+            if position < len(ordered):
+                reflection[f"aff_{ordered[position]['id']}_{field}"] = value
+
+    user_data['profile']['schema_version'] = SCHEMA_VERSION
+
+
+def day_ordinal(day: str) -> int:
+    """Convert an ISO date string to its proleptic Gregorian ordinal"""
+    return date.fromisoformat(day).toordinal()
+
+
+def parse_reflection(reflection: Dict[str, Any]) -> Dict[str, Tuple[int, bool]]:
+    """Return {affirmation key: (rating, not_relevant)} for one day's reflection"""
+    parsed = {}
+    for name, value in reflection.items():
+        match = RATING_KEY.match(name)
+        if not match:
+            continue
+        key, field = match.groups()
+        rating, not_relevant = parsed.get(key, (NO_RATING, False))
+        if field == 'rating':
+            rating = int(value)
+        else:
+            not_relevant = bool(value)
+        parsed[key] = (rating, not_relevant)
+    return parsed
+
+
+def _pad(buffer: array, fill: int, count: int) -> array:
+    """Append ``count`` copies of ``fill``, copying the buffer if a NumPy view pins it"""
+    padding = array(buffer.typecode, [fill]) * count
+    try:
+        buffer.extend(padding)
+        return buffer
+    except BufferError:
+        return buffer + padding
+
+
+class RatingIndex:
+    """Secondary index from affirmation ID to its {day: (rating, not_relevant)} entries"""
+
+    def __init__(self):
+        self.entries: Dict[str, Dict[str, Tuple[int, bool]]] = {}
+
+    @classmethod
+    def from_reflections(cls, daily_reflections: Dict[str, Dict[str, Any]]) -> 'RatingIndex':
+        index = cls()
+        for day, reflection in daily_reflections.items():
+            index.record_day(day, reflection)
+        return index
+
+    def record_day(self, day: str, reflection: Dict[str, Any]):
+        """Index (or re-index) the ratings of one completed day"""
+        if not reflection.get('completed'):
+            return
+        for affirmation_id, entry in parse_reflection(reflection).items():
+            self.entries.setdefault(affirmation_id, {})[day] = entry
+
+    def history(self, affirmation_id: str) -> List[Tuple[str, int, bool]]:
+        """Return (day, rating, not_relevant) entries of one affirmation, oldest first"""
+        entries = self.entries.get(affirmation_id, {})
+        return sorted((day, rating, not_relevant) for day, (rating, not_relevant) in entries.items())
+
+
+class RatingSeries:
+    """Ratings of one affirmation: int8 values plus a null mask, one slot per day"""
+
+    __slots__ = ('values', 'mask')
+
+    def __init__(self, length: int = 0):
+        self.values = array('b', [NO_RATING]) * length
+        # 1 where the day has no usable rating (not relevant, or not recorded)
+        self.mask = array('B', [1]) * length
+
+    def __len__(self):
+        return len(self.values)
+
+    def grow(self, length: int):
+        """Pad with empty days up to ``length`` slots"""
+        missing = length - len(self.values)
+        if missing > 0:
+            self.values = _pad(self.values, NO_RATING, missing)
+            self.mask = _pad(self.mask, 1, missing)
+
+    def set(self, index: int, rating: int, not_relevant: bool):
+        self.values[index] = rating
+        self.mask[index] = 1 if not_relevant or rating == NO_RATING else 0
+
+    def to_numpy(self):
+        """Return (values, mask) as NumPy views over the underlying buffers"""
+        import numpy as np
+        return np.frombuffer(self.values, dtype=np.int8), np.frombuffer(self.mask, dtype=np.bool_)
+
+
+class RatingStore:
+    """Per-affirmation rating series sharing one day axis"""
+
+    def __init__(self):
+        self.start: Optional[int] = None
+        self.length = 0
+        self.series: Dict[str, RatingSeries] = {}
+
+    @classmethod
+    def from_reflections(cls, daily_reflections: Dict[str, Dict[str, Any]]) -> 'RatingStore':
+        """Build a store from the ``daily_reflections`` section of the user data"""
+        store = cls()
+        ordinals = [day_ordinal(day) for day, reflection in daily_reflections.items() if reflection.get('completed')]
+        if ordinals:
+            store._extend(min(ordinals), max(ordinals))
+            for day, reflection in daily_reflections.items():
+                store.record_day(day, reflection)
+        return store
+
+    def _extend(self, first: int, last: int):
+        """Make sure the day axis covers ``first``..``last``"""
+        if self.start is None:
+            self.start = first
+        elif first < self.start:
+            # Rare (importing older history): shift every series right
+            shift = self.start - first
+            for key, old in self.series.items():
+                series = RatingSeries(shift)
+                series.values.extend(old.values)
+                series.mask.extend(old.mask)
+                self.series[key] = series
+            self.start = first
+            self.length += shift
+        self.length = max(self.length, last - self.start + 1)
+        for series in self.series.values():
+            series.grow(self.length)
+
+    def record_day(self, day: str, reflection: Dict[str, Any]):
+        """Store (or overwrite) the ratings of one completed day"""
+        if not reflection.get('completed'):
+            return
+        ordinal = day_ordinal(day)
+        if self.start is None or not 0 <= ordinal - self.start < self.length:
+            self._extend(ordinal, ordinal)
+        index = ordinal - self.start
+        for key, (rating, not_relevant) in parse_reflection(reflection).items():
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = RatingSeries(self.length)
+            series.set(index, rating, not_relevant)
+
+    def days(self) -> List[date]:
+        """Dates of the day axis, oldest first"""
+        if self.start is None:
+            return []
+        return [date.fromordinal(self.start + i) for i in range(self.length)]
+
+    def to_numpy(self, key: str):
+        """Return (values, mask) NumPy views for one affirmation"""
+        return self.series[key].to_numpy()
+
+    def to_frame(self, keys: Optional[Iterable[str]] = None):
+        """Return a DataFrame of nullable Int8 columns, one per affirmation (or per key in ``keys``), indexed by date
+
+        Each column wraps the series buffers without copying them; masked days are <NA>.
+        """
+        import pandas as pd
+        index = pd.date_range(date.fromordinal(self.start), periods=self.length, freq='D') \
+            if self.start is not None else pd.DatetimeIndex([])
+        columns = {}
+        for key in (self.series if keys is None else keys):
+            series = self.series.get(key)
+            if series is None:
+                continue
+            values, mask = series.to_numpy()
+            columns[key] = pd.arrays.IntegerArray(values, mask)
+        return pd.DataFrame(columns, index=index, copy=False)
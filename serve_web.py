@@ -1,42 +1,498 @@
 #!/usr/bin/env python3
 """
 Simple HTTP server for the Handy web app
+
+``python serve_web.py`` serves web/ for development. ``--production`` serves
+it from a threaded HTTP/1.1 server (keep-alive) with the assets loaded and
+gzip/brotli-compressed once into a bounded LRU cache (re-validated against
+file mtimes), ETag / Last-Modified validators, 304 responses to conditional
+requests and byte Range support.
+
+With HANDY_STORAGE=sqlite both modes answer the sync API at /api/sync, which
+the web app uses to share rows of user data with the Streamlit app.
 """
 
+import argparse
+import gzip
+import hashlib
 import http.server
+import json
+import mimetypes
+import posixpath
+import re
 import socketserver
 import os
+import threading
+import time
 import webbrowser
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote
 
 # Configuration
 PORT = 8000
 WEB_DIR = Path(__file__).parent / "web"
 
-class Handler(http.server.SimpleHTTPRequestHandler):
+# Content types worth compressing
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'application/manifest+json', 'image/svg+xml')
+
+# Cache-Control per kind of file: pages are revalidated on every load, other assets for an hour
+CACHE_CONTROL_PAGE = "no-cache"
+CACHE_CONTROL_ASSET = "public, max-age=3600"
+
+# Files written by build_web.py with a content hash in their name never change
+CACHE_CONTROL_IMMUTABLE = "public, max-age=31536000, immutable"
+HASHED_NAME = re.compile(r'\.[0-9a-f]{10}\.\w+$')
+
+# Unhashed files of a build that must be revalidated like pages
+REVALIDATED_FILES = ('sw.js', 'precache-manifest.json')
+
+# Asset cache: memory bound, largest file held in memory (bigger ones are sent
+# from disk with sendfile), and how often a cached file's mtime is checked
+MAX_CACHE_BYTES = 32 * 2 ** 20
+MAX_CACHED_FILE = 256 * 2 ** 10
+CHECK_INTERVAL = 1.0
+
+# Cache hit/miss counters as JSON
+STATS_PATH = "/_cache"
+
+# Sync API (see sync.py) and the largest request body it accepts
+SYNC_PATH = "/api/sync"
+MAX_SYNC_BODY = 1024 * 1024
+
+# The sync API needs storage shared with the Streamlit app: memory is private to
+# each process and the journal must have a single writer, so only SQLite qualifies
+SYNC_STORAGE = 'sqlite'
+SYNC_UNAVAILABLE = "Sync needs HANDY_STORAGE=sqlite"
+
+class SyncAPI:
+    """Request handler mixin answering the sync endpoints (see sync.py)
+
+    GET  /api/sync?since=<token>            rows changed since the token
+    POST /api/sync {client, since, changes} apply edits, return missing rows and conflicts
+    """
+
+    sync = None
+
+    def sync_request(self, method: str) -> bool:
+        """Answer the request if it is for the sync API; return whether it was"""
+        path, _, query = self.path.partition('?')
+        if path != SYNC_PATH:
+            return False
+        if self.sync is None:
+            self.send_error(503, SYNC_UNAVAILABLE)
+            return True
+        from sync import SyncError
+        try:
+            if method == 'GET':
+                result = self.sync.pull(parse_qs(query).get('since', [None])[0])
+            elif method == 'POST':
+                length = int(self.headers.get('Content-Length') or 0)
+                if length < 0:
+                    raise SyncError("Invalid Content-Length")
+                if length > MAX_SYNC_BODY:
+                    self.send_error(413, "Sync batch too large")
+                    return True
+                request = json.loads(self.rfile.read(length) or b'{}')
+                if not isinstance(request, dict):
+                    raise SyncError("Expected a JSON object")
+                result = self.sync.push(request.get('client'), request.get('changes', []), request.get('since'))
+            else:
+                self.send_error(405)
+                return True
+        except (SyncError, ValueError) as e:
+            self.send_error(400, str(e))
+            return True
+        body = json.dumps(result, separators=(',', ':')).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+
+class Handler(SyncAPI, http.server.SimpleHTTPRequestHandler):
+    root = WEB_DIR
+
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=str(WEB_DIR), **kwargs)
+        super().__init__(*args, directory=str(self.root), **kwargs)
+
+    def do_GET(self):
+        if not self.sync_request('GET'):
+            super().do_GET()
+
+    def do_POST(self):
+        if not self.sync_request('POST'):
+            self.send_error(404, "File not found")
+
+# Production mode
+
+def cache_control(path: Path) -> str:
+    """Cache-Control for a file: pages revalidate, hashed build output is immutable"""
+    if path.suffix == '.html' or path.name in REVALIDATED_FILES:
+        return CACHE_CONTROL_PAGE
+    if HASHED_NAME.search(path.name):
+        return CACHE_CONTROL_IMMUTABLE
+    return CACHE_CONTROL_ASSET
+
+
+class Asset:
+    """One file of web/ with its precompressed variants and validators
+
+    Files up to MAX_CACHED_FILE are held in memory; larger ones keep only
+    their metadata (``body`` is None) and are sent from disk.
+    """
+
+    __slots__ = ('path', 'body', 'encodings', 'content_type', 'etag', 'mtime', 'size', 'stamp',
+                 'last_modified', 'cache_control', 'checked')
+
+    def __init__(self, path: Path, stat: os.stat_result):
+        self.path = path
+        self.size = stat.st_size
+        self.stamp = (stat.st_mtime_ns, stat.st_size)
+        self.mtime = int(stat.st_mtime)
+        self.last_modified = formatdate(self.mtime, usegmt=True)
+        self.content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/'):
+            self.content_type += '; charset=utf-8'
+        self.cache_control = cache_control(path)
+        self.checked = time.monotonic()
+        # Content-Encoding -> compressed body, only kept when smaller
+        self.encodings: Dict[str, bytes] = {}
+        if self.size > MAX_CACHED_FILE:
+            self.body = None
+            self.etag = '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+            return
+        self.body = path.read_bytes()
+        self.etag = '"%s"' % hashlib.sha256(self.body).hexdigest()[:16]
+        if self.content_type.startswith(COMPRESSIBLE):
+            variants = {'gzip': gzip.compress(self.body, compresslevel=9, mtime=0)}
+            try:
+                import brotli
+                variants['br'] = brotli.compress(self.body, quality=11)
+            except ImportError:
+                pass
+            self.encodings = {name: data for name, data in variants.items() if len(data) < len(self.body)}
+
+    @property
+    def cost(self) -> int:
+        """Bytes this asset holds in memory"""
+        return len(self.body or b'') + sum(len(data) for data in self.encodings.values())
+
+    def negotiate(self, accept_encoding: str):
+        """Return (Content-Encoding or None, body) for an Accept-Encoding header"""
+        accepted = {}
+        for part in accept_encoding.split(','):
+            name, _, params = part.strip().partition(';')
+            quality = 1.0
+            if params.strip().startswith('q='):
+                try:
+                    quality = float(params.strip()[2:])
+                except ValueError:
+                    pass
+            accepted[name.strip().lower()] = quality
+        for name in ('br', 'gzip'):
+            if name in self.encodings and accepted.get(name, accepted.get('*', 0)) > 0:
+                return name, self.encodings[name]
+        return None, self.body
+
+
+class AssetCache:
+    """LRU cache of Assets keyed by URL path, bounded by the bytes held in memory
+
+    An entry is re-validated against the file's mtime and size at most every
+    CHECK_INTERVAL seconds, so edits to web/ show up without a restart.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = MAX_CACHE_BYTES, check_interval: float = CHECK_INTERVAL):
+        self.root = root.resolve()
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self.entries: 'OrderedDict[str, Asset]' = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, url_path: str) -> Optional[Asset]:
+        """The asset for ``url_path`` or None if there is no such file"""
+        with self._lock:
+            asset = self.entries.get(url_path)
+            if asset is not None:
+                self.entries.move_to_end(url_path)
+        now = time.monotonic()
+        if asset is not None and now - asset.checked < self.check_interval:
+            self.hits += 1
+            return asset
+
+        path = self.resolve(url_path)
+        try:
+            stat = path.stat() if path is not None else None
+        except OSError:
+            stat = None
+        if stat is None or not path.is_file():
+            self.discard(url_path)
+            return None
+        if asset is not None and asset.stamp == (stat.st_mtime_ns, stat.st_size):
+            asset.checked = now
+            self.hits += 1
+            return asset
+
+        # Loaded outside the lock: compression can take a while
+        self.misses += 1
+        asset = Asset(path, stat)
+        with self._lock:
+            old = self.entries.pop(url_path, None)
+            if old is not None:
+                self.bytes -= old.cost
+            self.entries[url_path] = asset
+            self.bytes += asset.cost
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= evicted.cost
+                self.evictions += 1
+        return asset
+
+    def discard(self, url_path: str):
+        with self._lock:
+            old = self.entries.pop(url_path, None)
+            if old is not None:
+                self.bytes -= old.cost
+
+    def resolve(self, url_path: str) -> Optional[Path]:
+        """Filesystem path for ``url_path``, or None if it escapes the root"""
+        relative = posixpath.normpath(unquote(url_path)).lstrip('/')
+        path = (self.root / relative).resolve()
+        if path != self.root and self.root not in path.parents:
+            return None
+        return path
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self.entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(first, last) byte of a single ``bytes=`` range, or None if it cannot be satisfied
+
+    Raises ValueError for headers this server does not handle (e.g. several ranges),
+    which are answered with the full body.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in spec:
+        raise ValueError(header)
+    first, _, last = spec.strip().partition('-')
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length <= 0 or size == 0:
+            return None
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = int(last) if last else size - 1
+    if first >= size or last < first:
+        return None
+    return first, min(last, size - 1)
+
+
+class ProductionHandler(SyncAPI, http.server.BaseHTTPRequestHandler):
+    """Serves web/ from the asset cache over HTTP/1.1 keep-alive connections"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "HandyWeb/1.0"
+    cache: AssetCache = None
+
+    def do_GET(self):
+        if not self.sync_request('GET'):
+            self.send_asset(head=False)
+
+    def do_POST(self):
+        if not self.sync_request('POST'):
+            self.send_error(404, "File not found")
+
+    def do_HEAD(self):
+        self.send_asset(head=True)
+
+    def find_asset(self) -> Optional[Asset]:
+        path = self.path.split('?', 1)[0].split('#', 1)[0]
+        if path.endswith('/'):
+            path += 'index.html'
+        return self.cache.get(path)
+
+    def not_modified(self, asset: Asset) -> bool:
+        """Whether the client's cached copy is current (If-None-Match wins over If-Modified-Since)"""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            return '*' in tags or asset.etag in tags
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return asset.mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def requested_range(self, asset: Asset):
+        """The Range to serve: None for the whole body, False if unsatisfiable"""
+        header = self.headers.get('Range')
+        if not header:
+            return None
+        # A stale If-Range means the client's partial copy is outdated: send everything
+        if_range = self.headers.get('If-Range')
+        if if_range and if_range.strip() not in (asset.etag, asset.last_modified):
+            return None
+        try:
+            return parse_range(header, asset.size) or False
+        except ValueError:
+            return None
+
+    def send_asset(self, head: bool):
+        if self.path.split('?', 1)[0] == STATS_PATH:
+            self.send_stats(head)
+            return
+        asset = self.find_asset()
+        if asset is None:
+            self.send_error(404, "File not found")
+            return
+        if self.not_modified(asset):
+            self.send_response(304)
+            self.send_validators(asset)
+            self.end_headers()
+            return
+
+        byte_range = self.requested_range(asset)
+        if byte_range is False:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{asset.size}')
+            self.send_header('Content-Length', '0')
+            self.send_validators(asset)
+            self.end_headers()
+            return
+        if byte_range is None:
+            encoding, body = asset.negotiate(self.headers.get('Accept-Encoding', ''))
+            first, length = 0, len(body) if body is not None else asset.size
+            self.send_response(200)
+        else:
+            # Ranges refer to the identity encoding
+            encoding, body = None, asset.body
+            first, last = byte_range
+            length = last - first + 1
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {first}-{last}/{asset.size}')
+        self.send_header('Content-Type', asset.content_type)
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        if asset.encodings:
+            self.send_header('Vary', 'Accept-Encoding')
+        self.send_validators(asset)
+        self.end_headers()
+        if head:
+            return
+        if body is not None:
+            self.wfile.write(memoryview(body)[first:first + length])
+        else:
+            self.send_file(asset, first, length)
+
+    def send_file(self, asset: Asset, offset: int, count: int):
+        """Send part of a large file straight from disk (os.sendfile where available)"""
+        try:
+            with open(asset.path, 'rb') as f:
+                self.connection.sendfile(f, offset, count)
+        except OSError:
+            # The file changed or vanished mid-response; the length sent no longer holds
+            self.close_connection = True
+
+    def send_validators(self, asset: Asset):
+        self.send_header('ETag', asset.etag)
+        self.send_header('Last-Modified', asset.last_modified)
+        self.send_header('Cache-Control', asset.cache_control)
+
+    def send_stats(self, head: bool):
+        body = json.dumps(self.cache.stats()).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+
+class ProductionServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    # Many clients reloading at once should queue in the kernel, not be refused
+    request_queue_size = 128
+
+
+def serve_production(root: Path, host: str, port: int, cache_mb: float = MAX_CACHE_BYTES / 2 ** 20):
+    ProductionHandler.cache = AssetCache(root, int(cache_mb * 2 ** 20))
+    # Warm the cache so the first clients do not pay for compression
+    for path in sorted(root.rglob('*')):
+        if path.is_file():
+            ProductionHandler.cache.get('/' + path.relative_to(root).as_posix())
+    stats = ProductionHandler.cache.stats()
+    print(f"Cached {stats['entries']} files ({stats['bytes']} bytes); cache statistics at {STATS_PATH}")
+    print(f"Serving Handy Web App at http://{host or 'localhost'}:{port} (production mode)")
+    with ProductionServer((host, port), ProductionHandler) as httpd:
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\nServer stopped.")
 
 def main():
+    parser = argparse.ArgumentParser(description="Serve the Handy web app")
+    parser.add_argument("--production", action="store_true",
+                        help="threaded keep-alive server with precompressed, cacheable assets")
+    parser.add_argument("--host", default="")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--no-browser", action="store_true", help="do not open a browser")
+    parser.add_argument("--cache-mb", type=float, default=MAX_CACHE_BYTES / 2 ** 20,
+                        help="memory for cached assets in production mode")
+    parser.add_argument("--root", type=Path, default=WEB_DIR,
+                        help="directory to serve, e.g. the output of build_web.py")
+    args = parser.parse_args()
+
     # Ensure the web directory exists
-    if not WEB_DIR.exists():
-        print(f"Error: Web directory not found at {WEB_DIR}")
+    if not args.root.exists():
+        print(f"Error: Web directory not found at {args.root}")
         return
-    
+
+    # The sync API reads and writes the same storage as the Streamlit app
+    if os.environ.get('HANDY_STORAGE', 'memory').lower() == SYNC_STORAGE:
+        from storage import backend_from_env
+        from sync import SyncService
+        SyncAPI.sync = SyncService(backend_from_env(), os.environ.get('HANDY_USER_ID', 'default'))
+    else:
+        print(f"Sync API disabled: {SYNC_UNAVAILABLE} (the web app keeps its data in the browser)")
+
+    if args.production:
+        serve_production(args.root, args.host, args.port, args.cache_mb)
+        return
+
     # Print server information
-    print(f"Starting Handy Web App server at http://localhost:{PORT}")
-    print(f"Serving files from: {WEB_DIR}")
+    print(f"Starting Handy Web App server at http://localhost:{args.port}")
+    print(f"Serving files from: {args.root}")
     print("Press Ctrl+C to stop the server")
-    
+
     # Open the browser
-    webbrowser.open(f"http://localhost:{PORT}")
-    
+    if not args.no_browser:
+        webbrowser.open(f"http://localhost:{args.port}")
+
     # Start the server
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
+    Handler.root = args.root
+    with socketserver.TCPServer((args.host, args.port), Handler) as httpd:
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
             print("\nServer stopped.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,417 @@
+"""
+Storage backends for Handy user data
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Any, Tuple, Optional
+
+# Top-level sections of the user data dict
+SECTIONS = ['profile', 'life_areas', 'goals', 'affirmations', 'daily_reflections']
+
+# Tables backing each section
+SECTION_TABLES = {
+    'profile': ['profile'],
+    'life_areas': ['life_areas'],
+    'goals': ['goals', 'goal_situations'],
+    'affirmations': ['affirmations'],
+    'daily_reflections': ['daily_reflections'],
+}
+
+# Key columns of each table (every table is also keyed by user_id)
+TABLE_KEYS = {
+    'profile': [('field', 'TEXT')],
+    'life_areas': [('area', 'TEXT')],
+    'goals': [('area', 'TEXT'), ('position', 'INTEGER')],
+    'goal_situations': [('area', 'TEXT')],
+    'affirmations': [('position', 'INTEGER')],
+    'daily_reflections': [('day', 'TEXT')],
+}
+
+# Section each table belongs to
+TABLE_SECTION = {table: section for section, tables in SECTION_TABLES.items() for table in tables}
+
+# Suffix of the "current situation" entries stored next to the goal lists
+SITUATION_SUFFIX = "_current"
+
+# A row key is (table, *key columns)
+RowKey = Tuple[Any, ...]
+
+
+def empty_section(section: str) -> Any:
+    """Return the empty value of a user data section"""
+    return [] if section == 'affirmations' else {}
+
+
+def empty_user_data() -> Dict[str, Any]:
+    """Return a fresh, empty user data dict"""
+    return {section: empty_section(section) for section in SECTIONS}
+
+
+def section_rows(section: str, value: Any) -> Dict[RowKey, Any]:
+    """Split a user data section into individually stored rows"""
+    rows = {}
+    if section == 'goals':
+        for key, item in value.items():
+            if isinstance(item, list):
+                for i, goal in enumerate(item):
+                    rows[('goals', key, i)] = goal
+            elif key.endswith(SITUATION_SUFFIX):
+                rows[('goal_situations', key[:-len(SITUATION_SUFFIX)])] = item
+    elif section == 'affirmations':
+        for i, affirmation in enumerate(value):
+            rows[('affirmations', i)] = affirmation
+    else:
+        for key, item in value.items():
+            rows[(section, key)] = item
+    return rows
+
+
+def section_value(section: str, rows: Dict[RowKey, Any]) -> Any:
+    """Rebuild a user data section from its rows"""
+    value = empty_section(section)
+    if section == 'goals':
+        for key in sorted(k for k in rows if k[0] == 'goals'):
+            value.setdefault(key[1], []).append(rows[key])
+        for key in rows:
+            if key[0] == 'goal_situations':
+                value[key[1] + SITUATION_SUFFIX] = rows[key]
+    elif section == 'affirmations':
+        value.extend(rows[key] for key in sorted(rows))
+    else:
+        for key in sorted(rows):
+            value[key[1]] = rows[key]
+    return value
+
+
+# Returned by row_value() for rows that do not exist (any more)
+MISSING = object()
+
+
+def is_row_group(key: RowKey) -> bool:
+    """Whether a row key names a group of rows (e.g. all goals of an area) rather than one row"""
+    return len(key) - 1 < len(TABLE_KEYS[key[0]])
+
+
+def row_value(section: str, value: Any, key: RowKey) -> Any:
+    """Return the value of one row of a section, or MISSING"""
+    try:
+        if key[0] == 'goals':
+            return value[key[1]][key[2]]
+        if key[0] == 'goal_situations':
+            return value[key[1] + SITUATION_SUFFIX]
+        return value[key[1]]
+    except (KeyError, IndexError, TypeError):
+        return MISSING
+
+
+def encode_row(value: Any) -> str:
+    """Serialise a row value to its stored JSON form"""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def encode_changes(section: str, value: Any, keys: List[RowKey]) -> Tuple[Dict[RowKey, Optional[str]], List[RowKey]]:
+    """Encode the rows named by ``keys`` as they are now
+
+    Returns ({row key: JSON, or None if the row no longer exists}, row groups).
+    Every current row of a group is included; stored rows of a group that are
+    not in the result are deleted by save_rows().
+    """
+    rows, groups = {}, []
+    for key in keys:
+        if is_row_group(key):
+            # Structural change (e.g. a goal removed): rewrite the whole group
+            groups.append(key)
+            for row_key, row in section_rows(section, value).items():
+                if row_key[:len(key)] == key:
+                    rows[row_key] = encode_row(row)
+        else:
+            row = row_value(section, value, key)
+            rows[key] = None if row is MISSING else encode_row(row)
+    return rows, groups
+
+
+class LazyUserData(dict):
+    """User data dict whose sections are loaded from a backend on first access"""
+
+    def __init__(self, backend: 'StorageBackend', user_id: str):
+        super().__init__()
+        self.backend = backend
+        self.user_id = user_id
+        # Optional callable(operation, section, seconds) told about each section load
+        self.observer = None
+
+    def __missing__(self, key):
+        if key not in SECTIONS:
+            raise KeyError(key)
+        start = time.perf_counter()
+        value = self.backend.load_section(self.user_id, key)
+        if self.observer is not None:
+            self.observer('load', key, time.perf_counter() - start)
+        dict.__setitem__(self, key, value)
+        return value
+
+    def __contains__(self, key):
+        return key in SECTIONS or dict.__contains__(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def loaded_sections(self) -> List[str]:
+        """Sections that have been read (or assigned) during this session"""
+        return [section for section in SECTIONS if dict.__contains__(self, section)]
+
+    def materialize(self) -> Dict[str, Any]:
+        """Load every section and return the data as a plain dict"""
+        return {section: self[section] for section in SECTIONS}
+
+
+class StorageBackend:
+    """Base class for user data storage backends"""
+
+    def load_section(self, user_id: str, section: str) -> Any:
+        raise NotImplementedError
+
+    def save_section(self, user_id: str, section: str, value: Any):
+        raise NotImplementedError
+
+    def load(self, user_id: str) -> LazyUserData:
+        """Return a user data dict that reads sections lazily"""
+        return LazyUserData(self, user_id)
+
+    def save_changes(self, user_id: str, section: str, value: Any, keys: List[RowKey]):
+        """Persist only the rows (or row groups) named by ``keys``"""
+        self.save_section(user_id, section, value)
+
+    def read_rows(self, user_id: str, section: str) -> Dict[RowKey, str]:
+        """Return the stored JSON of every row of a section"""
+        return {key: encode_row(row) for key, row in section_rows(section, self.load_section(user_id, section)).items()}
+
+    def save_rows(self, user_id: str, section: str, rows: Dict[RowKey, Optional[str]], groups: List[RowKey]):
+        """Write rows encoded by encode_changes() (None deletes a row)"""
+        current = {key: json.loads(text) for key, text in self.read_rows(user_id, section).items()}
+        for group in groups:
+            for key in [key for key in current if key[:len(group)] == group and key not in rows]:
+                del current[key]
+        for key, text in rows.items():
+            if text is None:
+                current.pop(key, None)
+            else:
+                current[key] = json.loads(text)
+        self.save_section(user_id, section, section_value(section, current))
+
+    def data_version(self) -> Optional[int]:
+        """A number that changes when another process writes the data, or None if unknown"""
+        return None
+
+    def save(self, user_id: str, data: Dict[str, Any], changes: Optional[List[RowKey]] = None):
+        """Persist the sections of ``data`` that were loaded or assigned
+
+        With ``changes`` (row keys from a ChangeTracker), only those rows are written.
+        """
+        if changes is not None:
+            by_section = {}
+            for key in changes:
+                by_section.setdefault(TABLE_SECTION[key[0]], []).append(key)
+            for section, keys in by_section.items():
+                self.save_changes(user_id, section, data[section], keys)
+            return
+        if isinstance(data, LazyUserData):
+            sections = data.loaded_sections()
+        else:
+            sections = [section for section in SECTIONS if section in data]
+        for section in sections:
+            self.save_section(user_id, section, data[section])
+
+    def close(self):
+        pass
+
+
+class MemoryBackend(StorageBackend):
+    """Keep user data in memory only (the plain session-state behaviour)"""
+
+    def __init__(self):
+        self._sections = {}
+
+    def load_section(self, user_id: str, section: str) -> Any:
+        return self._sections.get((user_id, section), empty_section(section))
+
+    def save_section(self, user_id: str, section: str, value: Any):
+        self._sections[(user_id, section)] = value
+
+
+class RowStorageBackend(StorageBackend):
+    """Backend that stores each section as rows and only writes rows that changed"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # (user_id, section) -> {row key: hash of stored JSON}
+        self._fingerprints = {}
+        # data_version() the fingerprints were taken at
+        self._fingerprint_version = None
+
+    def _read_rows(self, user_id: str, section: str) -> Dict[RowKey, str]:
+        """Return the stored JSON of every row of a section"""
+        raise NotImplementedError
+
+    def _write_rows(self, user_id: str, section: str,
+                    upserts: Dict[RowKey, str], deletes: List[RowKey]):
+        """Insert or replace ``upserts`` and remove ``deletes`` in one transaction"""
+        raise NotImplementedError
+
+    def _forget_stale_fingerprints(self):
+        """Drop the fingerprints once another process (e.g. the sync API) has written rows"""
+        version = self.data_version()
+        if version != self._fingerprint_version:
+            self._fingerprints.clear()
+            self._fingerprint_version = version
+
+    def load_section(self, user_id: str, section: str) -> Any:
+        stored = self.read_rows(user_id, section)
+        return section_value(section, {key: json.loads(text) for key, text in stored.items()})
+
+    def read_rows(self, user_id: str, section: str) -> Dict[RowKey, str]:
+        with self._lock:
+            self._forget_stale_fingerprints()
+            stored = self._read_rows(user_id, section)
+            self._fingerprints[(user_id, section)] = {key: hash(text) for key, text in stored.items()}
+        return stored
+
+    def save_section(self, user_id: str, section: str, value: Any):
+        encoded = {key: encode_row(row) for key, row in section_rows(section, value).items()}
+        with self._lock:
+            self._forget_stale_fingerprints()
+            previous = self._fingerprints.get((user_id, section))
+            if previous is None:
+                previous = {key: hash(text) for key, text in self._read_rows(user_id, section).items()}
+            current = {key: hash(text) for key, text in encoded.items()}
+            upserts = {key: encoded[key] for key, h in current.items() if previous.get(key) != h}
+            deletes = [key for key in previous if key not in current]
+            if upserts or deletes:
+                self._write_rows(user_id, section, upserts, deletes)
+            self._fingerprints[(user_id, section)] = current
+
+    def save_changes(self, user_id: str, section: str, value: Any, keys: List[RowKey]):
+        self.save_rows(user_id, section, *encode_changes(section, value, keys))
+
+    def save_rows(self, user_id: str, section: str, rows: Dict[RowKey, Optional[str]], groups: List[RowKey]):
+        """Write rows encoded by encode_changes(); safe to call from a background thread"""
+        with self._lock:
+            self._forget_stale_fingerprints()
+            fingerprints = self._fingerprints.get((user_id, section))
+            if fingerprints is None:
+                # Nothing known about the stored rows yet: read them to diff against
+                fingerprints = {key: hash(text) for key, text in self._read_rows(user_id, section).items()}
+                self._fingerprints[(user_id, section)] = fingerprints
+
+            upserts = {key: text for key, text in rows.items()
+                       if text is not None and fingerprints.get(key) != hash(text)}
+            deletes = [key for key, text in rows.items() if text is None and key in fingerprints]
+            for group in groups:
+                deletes.extend(key for key in fingerprints
+                               if key[:len(group)] == group and key not in rows)
+            if not upserts and not deletes:
+                return
+            try:
+                self._write_rows(user_id, section, upserts, deletes)
+            except Exception:
+                # Stored rows are now uncertain; the next save re-reads them
+                self._fingerprints.pop((user_id, section), None)
+                raise
+            for key in deletes:
+                del fingerprints[key]
+            for key, text in upserts.items():
+                fingerprints[key] = hash(text)
+
+
+class SQLiteBackend(RowStorageBackend):
+    """SQLite (WAL mode) backend with one indexed table per kind of row"""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        for table, keys in TABLE_KEYS.items():
+            columns = ", ".join(f"{name} {kind} NOT NULL" for name, kind in keys)
+            key_names = ", ".join(name for name, _ in keys)
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                f"user_id TEXT NOT NULL, {columns}, value TEXT NOT NULL, "
+                f"PRIMARY KEY (user_id, {key_names})) WITHOUT ROWID"
+            )
+
+    def _read_rows(self, user_id: str, section: str) -> Dict[RowKey, str]:
+        rows = {}
+        for table in SECTION_TABLES[section]:
+            key_names = ", ".join(name for name, _ in TABLE_KEYS[table])
+            cursor = self._conn.execute(
+                f"SELECT {key_names}, value FROM {table} WHERE user_id = ?", (user_id,)
+            )
+            for *key, text in cursor:
+                rows[(table, *key)] = text
+        return rows
+
+    def _write_rows(self, user_id: str, section: str,
+                    upserts: Dict[RowKey, str], deletes: List[RowKey]):
+        with self._conn:
+            self._conn.execute("BEGIN")
+            for table in SECTION_TABLES[section]:
+                key_names = [name for name, _ in TABLE_KEYS[table]]
+                removed = [(user_id, *key[1:]) for key in deletes if key[0] == table]
+                if removed:
+                    where = " AND ".join(f"{name} = ?" for name in ['user_id'] + key_names)
+                    self._conn.executemany(f"DELETE FROM {table} WHERE {where}", removed)
+                changed = [(user_id, *key[1:], text) for key, text in upserts.items() if key[0] == table]
+                if changed:
+                    placeholders = ", ".join("?" for _ in range(len(key_names) + 2))
+                    self._conn.executemany(
+                        f"INSERT OR REPLACE INTO {table} (user_id, {', '.join(key_names)}, value) "
+                        f"VALUES ({placeholders})",
+                        changed
+                    )
+
+    def data_version(self) -> Optional[int]:
+        # Changes whenever another connection (e.g. another process) commits
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Shared backends, one per storage location, reused by every session
+_shared_backends = {}
+_shared_lock = threading.Lock()
+
+
+def backend_from_env() -> StorageBackend:
+    """Create the storage backend selected by HANDY_STORAGE (memory, sqlite or journal)"""
+    kind = os.environ.get('HANDY_STORAGE', 'memory').lower()
+    if kind == 'memory':
+        return MemoryBackend()
+    if kind == 'sqlite':
+        path = os.environ.get('HANDY_DB_PATH', 'handy.db')
+        with _shared_lock:
+            if ('sqlite', path) not in _shared_backends:
+                _shared_backends[('sqlite', path)] = SQLiteBackend(path)
+            return _shared_backends[('sqlite', path)]
+    if kind == 'journal':
+        from journal import JournalBackend
+        directory = os.environ.get('HANDY_JOURNAL_DIR', 'handy_journal')
+        with _shared_lock:
+            if ('journal', directory) not in _shared_backends:
+                _shared_backends[('journal', directory)] = JournalBackend(directory)
+            return _shared_backends[('journal', directory)]
+    raise ValueError(f"Unknown storage backend: {kind}")
@@ -0,0 +1,233 @@
+"""
+Delta sync of user data rows for the web app
+
+A SyncService keeps, for every row of one user's data, its stored JSON, a
+version vector ({replica: number of edits made there}) and the sequence
+number of its last change. Clients pull the rows changed since a token and
+push batches of row edits, each carrying the vector it was based on; an edit
+based on an older vector than the stored one is a conflict and is returned
+instead of applied. Rows written by the Streamlit app straight to the
+backend are picked up when the backend reports a new data_version(), and
+attributed to the "app" replica.
+"""
+
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+
+from data_io import ImportValidationError, validate_record
+from ratings import SCHEMA_VERSION
+from storage import SECTIONS, SITUATION_SUFFIX, TABLE_KEYS, TABLE_SECTION, RowKey, StorageBackend, encode_row
+
+# Replica name of edits made outside the sync API (the Streamlit app)
+APP_REPLICA = "app"
+
+# Largest batch of changes accepted by one push
+MAX_CHANGES = 1000
+
+Vector = Dict[str, int]
+
+
+class SyncError(ValueError):
+    """A malformed sync request"""
+
+
+class RowState:
+    __slots__ = ('text', 'vector', 'seq')
+
+    def __init__(self, text: Optional[str], vector: Vector, seq: int):
+        # None for a deleted row (kept as a tombstone so pulls report the deletion)
+        self.text = text
+        self.vector = vector
+        self.seq = seq
+
+
+def descends(vector: Vector, other: Vector) -> bool:
+    """Whether ``vector`` includes every edit counted in ``other``"""
+    return all(vector.get(replica, 0) >= count for replica, count in other.items())
+
+
+def parse_key(key: Any) -> RowKey:
+    """Validate a row key received as a JSON list, e.g. ["profile", "job"]"""
+    if not isinstance(key, list) or not key or not isinstance(key[0], str) or key[0] not in TABLE_KEYS:
+        raise SyncError(f"Unknown row key: {key!r}")
+    columns = TABLE_KEYS[key[0]]
+    if len(key) - 1 != len(columns):
+        raise SyncError(f"Row key {key!r} needs {len(columns)} key columns")
+    for value, (_, kind) in zip(key[1:], columns):
+        expected = int if kind == 'INTEGER' else str
+        if type(value) is not expected or (expected is int and value < 0):
+            raise SyncError(f"Row key {key!r}: {value!r} is not a valid {expected.__name__}")
+    return tuple(key)
+
+
+def validate_row(key: RowKey, value: Any):
+    """Check a pushed row value with the import validators (see data_io.validate_record)"""
+    table = key[0]
+    if table == 'profile':
+        record = {'section': 'profile', 'value': {key[1]: value}}
+    elif table == 'life_areas':
+        record = {'section': 'life_areas', 'value': {key[1]: value}}
+    elif table == 'goals':
+        record = {'section': 'goals', 'key': key[1], 'value': [value]}
+    elif table == 'goal_situations':
+        record = {'section': 'goals', 'key': key[1] + SITUATION_SUFFIX, 'value': value}
+    elif table == 'affirmations':
+        record = {'section': 'affirmations', 'value': value}
+    else:
+        record = {'section': table, 'key': key[1], 'value': value}
+    try:
+        validate_record(record, SCHEMA_VERSION)
+    except ImportValidationError as e:
+        raise SyncError(str(e))
+
+
+def parse_vector(vector: Any) -> Vector:
+    if vector is None:
+        return {}
+    if not isinstance(vector, dict) or not all(
+            isinstance(replica, str) and type(count) is int and count >= 0 for replica, count in vector.items()):
+        raise SyncError(f"Bad version vector: {vector!r}")
+    return vector
+
+
+class SyncService:
+    """Pull/push of row deltas for one user, backed by a storage backend (thread-safe)"""
+
+    def __init__(self, backend: StorageBackend, user_id: str):
+        self.backend = backend
+        self.user_id = user_id
+        # Tokens are "<epoch>.<seq>"; a new epoch (server restart) makes clients resync
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        # Row key -> state, ordered by seq so a pull only walks the rows it returns
+        self.rows: 'OrderedDict[RowKey, RowState]' = OrderedDict()
+        self._data_version = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    # Tokens
+
+    def token(self) -> str:
+        return f"{self.epoch}.{self.seq}"
+
+    def parse_token(self, token: Optional[str]) -> Optional[int]:
+        """Sequence number of ``token``, or None if the client must start over"""
+        if not token:
+            return None
+        epoch, _, seq = str(token).partition('.')
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self.seq:
+            return None
+        return int(seq)
+
+    # Requests
+
+    def pull(self, token: Optional[str] = None) -> Dict[str, Any]:
+        """Rows changed since ``token`` (all rows if it is missing or stale)"""
+        with self._lock:
+            self._refresh()
+            return self._changes_since(token)
+
+    def push(self, replica: str, changes: List[Dict[str, Any]], token: Optional[str] = None) -> Dict[str, Any]:
+        """Apply a batch of edits from ``replica`` and return what the client is missing
+
+        Each change is ``{"key": [...], "value": ..., "base": {vector}}`` or
+        ``{"key": [...], "deleted": true, "base": {...}}``. The response holds
+        the rows changed since ``token`` (including the accepted edits, with
+        their new vectors) and the rejected edits under "conflicts".
+        """
+        if not isinstance(replica, str) or not replica or replica == APP_REPLICA:
+            raise SyncError("A client id is required")
+        if not isinstance(changes, list) or len(changes) > MAX_CHANGES:
+            raise SyncError(f"Changes must be a list of at most {MAX_CHANGES} items")
+        parsed = []
+        for change in changes:
+            if not isinstance(change, dict):
+                raise SyncError(f"Bad change: {change!r}")
+            key = parse_key(change.get('key'))
+            if change.get('deleted'):
+                text = None
+            else:
+                validate_row(key, change.get('value'))
+                text = encode_row(change.get('value'))
+            parsed.append((key, text, parse_vector(change.get('base'))))
+
+        with self._lock:
+            self._refresh()
+            by_section: Dict[str, Dict[RowKey, Optional[str]]] = {}
+            conflicts = []
+            for key, text, base in parsed:
+                state = self.rows.get(key)
+                current = state.vector if state is not None else {}
+                if not descends(base, current):
+                    conflicts.append(self._row(key, state))
+                    continue
+                if state is not None and state.text == text:
+                    continue
+                vector = {replica: count for replica, count in current.items()}
+                for other, count in base.items():
+                    vector[other] = max(vector.get(other, 0), count)
+                vector[replica] = vector.get(replica, 0) + 1
+                self._set(key, text, vector)
+                by_section.setdefault(TABLE_SECTION[key[0]], {})[key] = text
+            for section, rows in by_section.items():
+                self.backend.save_rows(self.user_id, section, rows, [])
+            # Our own writes must not look like the app's on the next refresh
+            self._data_version = self.backend.data_version()
+            response = self._changes_since(token)
+            response['conflicts'] = conflicts
+            return response
+
+    # Internals (called with the lock held)
+
+    def _refresh(self):
+        """Load every row on first use, then pick up rows written by other processes"""
+        version = self.backend.data_version()
+        if self._loaded and (version is None or version == self._data_version):
+            return
+        initial = not self._loaded
+        for section in SECTIONS:
+            stored = self.backend.read_rows(self.user_id, section)
+            for key, text in stored.items():
+                state = self.rows.get(key)
+                if state is None or state.text != text:
+                    self._set(key, text, self._external_vector(state, initial))
+            for key, state in list(self.rows.items()):
+                if TABLE_SECTION[key[0]] == section and state.text is not None and key not in stored:
+                    self._set(key, None, self._external_vector(state, initial))
+        self._loaded = True
+        self._data_version = version
+
+    @staticmethod
+    def _external_vector(state: Optional[RowState], initial: bool) -> Vector:
+        if initial:
+            return {}
+        vector = dict(state.vector) if state is not None else {}
+        vector[APP_REPLICA] = vector.get(APP_REPLICA, 0) + 1
+        return vector
+
+    def _set(self, key: RowKey, text: Optional[str], vector: Vector):
+        self.seq += 1
+        self.rows.pop(key, None)
+        self.rows[key] = RowState(text, vector, self.seq)
+
+    def _changes_since(self, token: Optional[str]) -> Dict[str, Any]:
+        since = self.parse_token(token)
+        changes = []
+        for key, state in reversed(self.rows.items()):
+            if since is not None and state.seq <= since:
+                break
+            if since is None and state.text is None:
+                # A full resync only needs the rows that exist
+                continue
+            changes.append(self._row(key, state))
+        changes.reverse()
+        return {'token': self.token(), 'reset': since is None, 'changes': changes}
+
+    @staticmethod
+    def _row(key: RowKey, state: Optional[RowState]) -> Dict[str, Any]:
+        if state is None or state.text is None:
+            return {'key': list(key), 'deleted': True, 'vector': state.vector if state else {}}
+        return {'key': list(key), 'value': json.loads(state.text), 'vector': state.vector}
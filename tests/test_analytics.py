@@ -0,0 +1,28 @@
+"""
+Streaks over the rating store
+"""
+
+from analytics import AdherenceAnalytics
+from ratings import RatingStore, rating_key
+
+
+def reflections(*ratings, completed=True):
+    return {f"2024-01-{day:02d}": {rating_key('a'): rating, 'completed': completed}
+            for day, rating in enumerate(ratings, 1)}
+
+
+def test_streaks():
+    analytics = AdherenceAnalytics(RatingStore.from_reflections(reflections(8, 9, 3, 7, 10)))
+    assert (analytics.stats['a'].current, analytics.stats['a'].longest) == (2, 2)
+
+
+def test_opened_but_unsaved_day_keeps_the_streak():
+    days = reflections(8, 9)
+    # Opening Daily Reflection stores the slider defaults without completing the day
+    days['2024-01-03'] = {rating_key('a'): 5}
+    store = RatingStore.from_reflections(days)
+    analytics = AdherenceAnalytics(store)
+    assert analytics.stats['a'].current == 2
+
+    store.record_day('2024-01-04', {rating_key('a'): 5})
+    assert len(store.days()) == 2
@@ -0,0 +1,78 @@
+"""
+Lifecycle of the background autosave worker
+"""
+
+import time
+
+from autosave import AutosaveWorker
+from storage import SQLiteBackend
+
+
+def make_backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / "handy.db"))
+
+
+def test_flush_writes_submitted_rows(tmp_path):
+    backend = make_backend(tmp_path)
+    worker = AutosaveWorker(backend, 'u', debounce=60)
+    worker.submit({'profile': {'job': 'a'}}, [('profile', 'job')])
+    assert worker.flush(timeout=5)
+    assert backend.load_section('u', 'profile') == {'job': 'a'}
+    worker.stop(timeout=5)
+    assert not worker.running()
+
+
+def test_disconnect_writes_pending_rows(tmp_path):
+    backend = make_backend(tmp_path)
+    connected = [True]
+    worker = AutosaveWorker(backend, 'u', debounce=1, alive=lambda: connected[0])
+    worker.submit({'profile': {'job': 'a'}}, [('profile', 'job')])
+    # Checked when the worker is idle, before the debounce has passed
+    connected[0] = False
+    worker._thread.join(timeout=5)
+    assert not worker.running()
+    assert backend.load_section('u', 'profile') == {'job': 'a'}
+
+
+def test_submit_after_reconnect(tmp_path):
+    backend = make_backend(tmp_path)
+    connected = [True]
+    alive = lambda: connected[0]
+    worker = AutosaveWorker(backend, 'u', debounce=0, alive=alive)
+    worker.submit({'profile': {'job': 'a'}}, [('profile', 'job')], flush=True)
+    connected[0] = False
+    worker._thread.join(timeout=5)
+
+    # The browser reconnects to the same session state; handy.get_autosave_worker
+    # replaces a worker that is no longer running
+    connected[0] = True
+    assert not worker.running()
+    worker.stop(timeout=5)
+    worker = AutosaveWorker(backend, 'u', debounce=0, alive=alive)
+    worker.submit({'profile': {'job': 'b'}}, [('profile', 'job')], flush=True)
+    assert worker.flush(timeout=5)
+    assert backend.load_section('u', 'profile') == {'job': 'b'}
+    worker.stop(timeout=5)
+
+
+def test_batch_size_writes_without_waiting(tmp_path):
+    backend = make_backend(tmp_path)
+    worker = AutosaveWorker(backend, 'u', debounce=60, batch_size=2)
+    data = {'profile': {'job': 'a', 'hobbies': ['Reading']}}
+    worker.submit(data, [('profile', 'job'), ('profile', 'hobbies')])
+    deadline = time.monotonic() + 5
+    while backend.load_section('u', 'profile') != data['profile'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert backend.load_section('u', 'profile') == data['profile']
+    worker.stop(timeout=5)
+
+
+def test_removed_rows_are_deleted(tmp_path):
+    backend = make_backend(tmp_path)
+    worker = AutosaveWorker(backend, 'u', debounce=60)
+    goals = {'Health': [{'title': 'Run'}, {'title': 'Swim'}]}
+    worker.submit({'goals': goals}, [('goals', 'Health')], flush=True)
+    goals['Health'].pop(0)
+    worker.submit({'goals': goals}, [('goals', 'Health')])
+    worker.stop(timeout=5)
+    assert backend.load_section('u', 'goals') == {'Health': [{'title': 'Swim'}]}
@@ -0,0 +1,131 @@
+"""
+Import validation and merging of exported user data
+"""
+
+import io
+import json
+
+import pytest
+
+import data_io
+import ratings
+from data_io import ImportValidationError
+from storage import empty_user_data
+
+
+def sample_data():
+    data = empty_user_data()
+    data['profile'].update({'job': 'Engineer', 'setup_completed': True, 'schema_version': 2})
+    data['goals']['Health'] = [{'title': 'Run', 'why': '', 'how': '', 'empowering_beliefs': '', 'limiting_beliefs': ''}]
+    data['affirmations'].append({'id': 'a1', 'text': 'I am calm', 'priority': 1, 'area': None})
+    data['daily_reflections']['2024-01-01'] = {'aff_a1_rating': 8, 'completed': True,
+                                               'completion_time': '2024-01-01T20:00:00'}
+    return data
+
+
+def test_export_round_trip():
+    data = sample_data()
+    for fmt in data_io.EXPORT_FORMATS:
+        exported = data_io.export_bytes(data, fmt)
+        assert data_io.read_import(io.BytesIO(exported)) == data
+
+
+def test_affirmation_without_id_is_rejected():
+    data = sample_data()
+    del data['affirmations'][0]['id']
+    with pytest.raises(ImportValidationError, match="missing 'id'"):
+        data_io.read_import(io.BytesIO(data_io.export_bytes(data, 'ndjson')))
+
+    # Also when the profile comes after the affirmations
+    document = {'affirmations': data['affirmations'], 'profile': data['profile']}
+    with pytest.raises(ImportValidationError, match="missing 'id'"):
+        data_io.read_import(io.BytesIO(json.dumps(document).encode('utf-8')))
+
+
+def import_into(user_data, exported: bytes):
+    """What the Dashboard's Confirm Import does"""
+    imported = data_io.read_import(io.BytesIO(exported))
+    if ratings.needs_migration(imported):
+        ratings.migrate_affirmation_ids(imported, user_data['affirmations'])
+    return data_io.merge_user_data(user_data, imported)
+
+
+def test_reimporting_a_pre_id_export_does_not_duplicate():
+    # An export from before affirmations had IDs: ratings keyed by position
+    old = empty_user_data()
+    old['affirmations'] = [{'text': 'I am calm', 'priority': 2}, {'text': 'I am strong', 'priority': 1}]
+    old['daily_reflections']['2024-01-01'] = {'aff_0_rating': 9, 'aff_1_rating': 3}
+    exported = json.dumps(old).encode('utf-8')
+
+    user_data = empty_user_data()
+    import_into(user_data, exported)
+    first = [dict(affirmation) for affirmation in user_data['affirmations']]
+    import_into(user_data, exported)
+
+    assert user_data['affirmations'] == first
+    ids = {affirmation['text']: affirmation['id'] for affirmation in first}
+    reflection = user_data['daily_reflections']['2024-01-01']
+    assert reflection[ratings.rating_key(ids['I am strong'])] == 9
+    assert reflection[ratings.rating_key(ids['I am calm'])] == 3
+
+
+def test_columnar_export_skips_malformed_completion_time():
+    pytest.importorskip("pyarrow")
+    data = sample_data()
+    data['daily_reflections']['2024-01-01']['completion_time'] = 'yesterday evening'
+    imported = data_io.read_columnar(io.BytesIO(data_io.export_columnar(data, 'parquet')))
+    assert 'completion_time' not in imported['daily_reflections']['2024-01-01']
+    assert imported['daily_reflections']['2024-01-01']['aff_a1_rating'] == 8
+
+
+def test_columnar_import_reports_bad_rows():
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    import zipfile
+
+    def archive_with(name, table):
+        exported = data_io.export_columnar(sample_data(), 'parquet')
+        output = io.BytesIO()
+        with zipfile.ZipFile(io.BytesIO(exported)) as source, zipfile.ZipFile(output, 'w') as target:
+            for member in source.namelist():
+                if member != f"{name}.parquet":
+                    target.writestr(member, source.read(member))
+            sink = pa.BufferOutputStream()
+            pq.write_table(table, sink)
+            target.writestr(f"{name}.parquet", sink.getvalue().to_pybytes())
+        output.seek(0)
+        return output
+
+    null_day = pa.table({'day': pa.array([None], pa.timestamp('s')), 'affirmation_id': ['a1'],
+                         'rating': pa.array([8], pa.int8()), 'not_relevant': [False]})
+    with pytest.raises(ImportValidationError, match=r"reflection_ratings.parquet row 0: missing or invalid day"):
+        data_io.read_columnar(archive_with('reflection_ratings', null_day))
+
+    missing_column = pa.table({'day': pa.array([None], pa.timestamp('s'))})
+    with pytest.raises(ImportValidationError, match="missing columns"):
+        data_io.read_columnar(archive_with('reflection_days', missing_column))
+
+
+def test_merge_user_data():
+    user_data = sample_data()
+    imported = empty_user_data()
+    imported['profile'] = {'job': 'Teacher', 'schema_version': 1}
+    imported['goals'] = {'Health': [{'title': 'Run', 'why': 'fitter'}, {'title': 'Swim'}], 'Health_current': 'ok'}
+    imported['affirmations'] = [{'id': 'a1', 'text': 'I am patient'}, {'id': 'a2', 'text': 'I am kind'}]
+    imported['daily_reflections'] = {
+        # Completed earlier than the stored day: the stored day is kept
+        '2024-01-01': {'completed': True, 'completion_time': '2024-01-01T08:00:00'},
+        '2024-01-02': {'completed': True, 'completion_time': '2024-01-02T20:00:00'},
+    }
+
+    counts = data_io.merge_user_data(user_data, imported)
+
+    assert counts == {'goals': 2, 'affirmations': 2, 'days': 1}
+    assert user_data['profile']['job'] == 'Teacher'
+    assert user_data['profile']['schema_version'] == 2
+    assert [goal['title'] for goal in user_data['goals']['Health']] == ['Run', 'Swim']
+    assert user_data['goals']['Health'][0]['why'] == 'fitter'
+    assert user_data['goals']['Health_current'] == 'ok'
+    assert [(a['id'], a['text']) for a in user_data['affirmations']] == [('a1', 'I am patient'), ('a2', 'I am kind')]
+    assert user_data['daily_reflections']['2024-01-01']['aff_a1_rating'] == 8
+    assert '2024-01-02' in user_data['daily_reflections']
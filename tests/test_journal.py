@@ -0,0 +1,27 @@
+"""
+Crash recovery of the journal backend
+"""
+
+import os
+
+from journal import JOURNAL_FILE, JournalBackend
+
+
+def test_torn_tail_is_truncated_before_appending(tmp_path):
+    directory = str(tmp_path)
+    backend = JournalBackend(directory)
+    backend.save_section('u', 'profile', {'job': 'a'})
+    backend.close()
+
+    # A crash in the middle of writing an event
+    with open(os.path.join(directory, JOURNAL_FILE), 'a', encoding='utf-8') as f:
+        f.write('{"seq":99,"type":"profile_field_set","us')
+
+    backend = JournalBackend(directory)
+    assert backend.load_section('u', 'profile') == {'job': 'a'}
+    backend.save_section('u', 'profile', {'job': 'b'})
+    backend.close()
+
+    backend = JournalBackend(directory)
+    assert backend.load_section('u', 'profile') == {'job': 'b'}
+    backend.close()
@@ -0,0 +1,25 @@
+"""
+Row storage backends
+"""
+
+from storage import SQLiteBackend, encode_row
+
+
+def test_save_only_writes_changed_rows(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "handy.db"))
+    backend.save_section('u', 'goals', {'Health': [{'title': 'Run'}], 'Health_current': 'ok'})
+    backend.save_section('u', 'goals', {'Health': [{'title': 'Run'}, {'title': 'Swim'}]})
+    assert backend.load_section('u', 'goals') == {'Health': [{'title': 'Run'}, {'title': 'Swim'}]}
+
+
+def test_full_save_after_another_process_wrote(tmp_path):
+    path = str(tmp_path / "handy.db")
+    app, other = SQLiteBackend(path), SQLiteBackend(path)
+    app.save_section('u', 'profile', {'job': 'a'})
+
+    # e.g. the sync API in serve_web.py
+    other.save_rows('u', 'profile', {('profile', 'job'): encode_row('b')}, [])
+
+    # The app's copy still says 'a'; a full save must write it, not trust its fingerprints
+    app.save_section('u', 'profile', {'job': 'a'})
+    assert other.load_section('u', 'profile') == {'job': 'a'}
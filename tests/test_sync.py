@@ -0,0 +1,93 @@
+"""
+Delta sync of user data rows
+"""
+
+import pytest
+
+from storage import SQLiteBackend
+from sync import SyncError, SyncService
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "handy.db"))
+    backend.save_section('u', 'profile', {'job': 'Engineer'})
+    yield backend
+    backend.close()
+
+
+def rows(response):
+    return {tuple(change['key']): change for change in response['changes']}
+
+
+def test_pull_returns_everything_then_only_changes(backend):
+    service = SyncService(backend, 'u')
+    first = service.pull()
+    assert first['reset']
+    assert rows(first)[('profile', 'job')]['value'] == 'Engineer'
+
+    assert service.pull(first['token'])['changes'] == []
+    pushed = service.push('phone', [{'key': ['profile', 'job'], 'value': 'Teacher', 'base': {}}], first['token'])
+    assert not pushed['reset'] and pushed['conflicts'] == []
+    assert rows(pushed)[('profile', 'job')]['vector'] == {'phone': 1}
+    assert backend.load_section('u', 'profile') == {'job': 'Teacher'}
+
+
+def test_stale_edit_is_a_conflict(backend):
+    service = SyncService(backend, 'u')
+    token = service.pull()['token']
+    service.push('phone', [{'key': ['profile', 'job'], 'value': 'Teacher', 'base': {}}], token)
+
+    # The laptop has not seen the phone's edit
+    response = service.push('laptop', [{'key': ['profile', 'job'], 'value': 'Pilot', 'base': {}}], token)
+    assert [conflict['value'] for conflict in response['conflicts']] == ['Teacher']
+    assert backend.load_section('u', 'profile') == {'job': 'Teacher'}
+
+    # Rebased on the phone's vector it is accepted
+    response = service.push('laptop', [{'key': ['profile', 'job'], 'value': 'Pilot', 'base': {'phone': 1}}])
+    assert response['conflicts'] == []
+    assert rows(response)[('profile', 'job')]['vector'] == {'phone': 1, 'laptop': 1}
+
+
+def test_deletion_is_pulled_as_tombstone(backend):
+    service = SyncService(backend, 'u')
+    token = service.pull()['token']
+    service.push('phone', [{'key': ['profile', 'job'], 'deleted': True, 'base': {}}])
+    assert rows(service.pull(token))[('profile', 'job')]['deleted']
+    assert backend.load_section('u', 'profile') == {}
+    # A full resync leaves deleted rows out
+    assert service.pull()['changes'] == []
+
+
+def test_external_writes_are_picked_up(backend, tmp_path):
+    service = SyncService(backend, 'u')
+    token = service.pull()['token']
+
+    # The Streamlit app writes through its own connection
+    app = SQLiteBackend(str(tmp_path / "handy.db"))
+    app.save_section('u', 'profile', {'job': 'Nurse', 'hobbies': ['Reading']})
+    app.close()
+
+    changed = rows(service.pull(token))
+    assert changed[('profile', 'job')]['value'] == 'Nurse'
+    assert changed[('profile', 'job')]['vector'] == {'app': 1}
+    assert changed[('profile', 'hobbies')]['value'] == ['Reading']
+
+
+def test_unknown_token_starts_over(backend):
+    service = SyncService(backend, 'u')
+    assert service.pull('otherepoch.3')['reset']
+
+
+@pytest.mark.parametrize('change', [
+    {'key': ['nope', 'x'], 'value': 1},
+    {'key': ['affirmations', -1], 'value': {'id': 'a', 'text': 't'}},
+    {'key': ['affirmations', 0], 'value': {'text': 'no id'}},
+    {'key': ['daily_reflections', '2024-01-01'], 'value': {'aff_a_rating': 11}},
+    {'key': ['profile', 'job'], 'value': 'x', 'base': {'phone': -1}},
+])
+def test_malformed_changes_are_rejected(backend, change):
+    service = SyncService(backend, 'u')
+    with pytest.raises(SyncError):
+        service.push('phone', [change])
+    assert backend.load_section('u', 'profile') == {'job': 'Engineer'}
@@ -0,0 +1,59 @@
+"""
+Change tracking over the user data
+
+Pages assign widget values through a ChangeTracker, which only writes (and
+marks dirty) the entries whose value actually changed. Dirty entries are
+recorded as storage row keys, e.g. ``('goals', area, i)`` or
+``('daily_reflections', day)``; a shorter key such as ``('goals', area)``
+marks a structural change (rows added, removed or reordered) of that group.
+"""
+
+from typing import Dict, List
+
+from storage import RowKey
+
+_MISSING = object()
+
+
+class ChangeTracker:
+    """Records which rows of the user data changed, and at which version"""
+
+    def __init__(self):
+        self.version = 0
+        # Version that was last written to the storage backend
+        self.saved_version = 0
+        # Latest version at which each row changed; bounded by the number of rows
+        self._log: Dict[RowKey, int] = {}
+
+    def mark(self, *key):
+        """Mark one row (or a row group) as changed"""
+        self.version += 1
+        self._log[key] = self.version
+
+    def assign(self, container, name, value, *key) -> bool:
+        """Set ``container[name] = value`` if it differs, marking row ``key`` dirty
+
+        Returns whether anything changed.
+        """
+        try:
+            current = container[name]
+        except (KeyError, IndexError):
+            current = _MISSING
+        if current is not _MISSING and current == value:
+            return False
+        container[name] = value
+        self.mark(*key)
+        return True
+
+    def changes_since(self, version: int) -> List[RowKey]:
+        """Row keys changed after ``version``"""
+        return [key for key, changed in self._log.items() if changed > version]
+
+    @property
+    def dirty(self) -> List[RowKey]:
+        """Rows changed since the last save"""
+        return self.changes_since(self.saved_version)
+
+    def mark_saved(self):
+        """Record that every change so far was persisted"""
+        self.saved_version = self.version
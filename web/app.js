@@ -138,6 +138,172 @@ function setupSortable(element) {
     });
 }
 
+// Sync with serve_web.py: rows are kept locally and only edited rows are sent
+const SYNC_URL = '/api/sync';
+const SYNC_STORE = 'handySync';
+const LEGACY_STORE = 'handyUserData';
+
+// Profile fields edited by this app, as rows of the shared user data
+const PROFILE_FIELDS = ['name', 'job', 'hobbies', 'life_area_priority'];
+
+// Local copy of the rows ({token, rows, pending}), persisted so the app works offline
+let syncState = null;
+let syncInFlight = null;
+
+function loadSyncState() {
+    try {
+        syncState = JSON.parse(localStorage.getItem(SYNC_STORE));
+    } catch (e) {
+        syncState = null;
+    }
+    if (!syncState) {
+        syncState = {client: newClientId(), token: null, rows: {}, pending: {}};
+        // Profiles saved before sync existed become pending edits
+        const legacy = localStorage.getItem(LEGACY_STORE);
+        if (legacy) {
+            const userData = JSON.parse(legacy);
+            queueProfile({
+                name: userData.name,
+                job: userData.job,
+                hobbies: userData.hobbies,
+                life_area_priority: userData.lifeAreas
+            });
+            localStorage.removeItem(LEGACY_STORE);
+        }
+        storeSyncState();
+    }
+}
+
+function newClientId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+function storeSyncState() {
+    localStorage.setItem(SYNC_STORE, JSON.stringify(syncState));
+}
+
+function rowId(key) {
+    return JSON.stringify(key);
+}
+
+// Current value of a row: a pending local edit, else the last synced value
+function rowValue(key) {
+    const id = rowId(key);
+    if (id in syncState.pending) {
+        return syncState.pending[id].deleted ? undefined : syncState.pending[id].value;
+    }
+    const row = syncState.rows[id];
+    return row ? row.value : undefined;
+}
+
+// Record local edits of profile fields whose value changed
+function queueProfile(profile) {
+    PROFILE_FIELDS.forEach(field => {
+        const value = profile[field];
+        if (value === undefined) {
+            return;
+        }
+        const key = ['profile', field];
+        if (JSON.stringify(rowValue(key)) === JSON.stringify(value)) {
+            return;
+        }
+        const row = syncState.rows[rowId(key)];
+        syncState.pending[rowId(key)] = {key: key, value: value, base: row ? row.vector : {}};
+    });
+}
+
+// Send pending edits and fetch other changes in a single request; safe to call any time
+function syncNow() {
+    if (syncInFlight || !navigator.onLine) {
+        return syncInFlight;
+    }
+    const sent = Object.assign({}, syncState.pending);
+    const changes = Object.values(sent);
+    const request = changes.length
+        ? fetch(SYNC_URL, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({client: syncState.client, since: syncState.token, changes: changes})
+        })
+        : fetch(SYNC_URL + (syncState.token ? '?since=' + encodeURIComponent(syncState.token) : ''));
+
+    let again = false;
+    syncInFlight = request
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Sync failed: ' + response.status);
+            }
+            return response.json();
+        })
+        .then(result => {
+            again = applySync(result, sent);
+            renderProfile();
+        })
+        .catch(() => {
+            // Offline or no sync server: edits stay queued until the next attempt
+        })
+        .finally(() => {
+            syncInFlight = null;
+            // Rows re-queued after a reset are sent straight away
+            if (again) {
+                syncNow();
+            }
+        });
+    return syncInFlight;
+}
+
+function applySync(result, sent) {
+    // A reset (new server, or one that lost its data) lists every row the server has;
+    // local rows missing from it are queued again instead of being dropped
+    const previous = result.reset ? syncState.rows : {};
+    if (result.reset) {
+        syncState.rows = {};
+    }
+    result.changes.forEach(row => {
+        const id = rowId(row.key);
+        if (row.deleted) {
+            delete syncState.rows[id];
+        } else {
+            syncState.rows[id] = {value: row.value, vector: row.vector};
+        }
+    });
+    // Sent edits are done (accepted, or superseded by the server's row on a conflict),
+    // unless they were edited again while the request was in flight
+    Object.keys(sent).forEach(id => {
+        if (syncState.pending[id] === sent[id]) {
+            delete syncState.pending[id];
+        }
+    });
+    (result.conflicts || []).forEach(row => {
+        const id = rowId(row.key);
+        if (row.deleted) {
+            delete syncState.rows[id];
+        } else {
+            syncState.rows[id] = {value: row.value, vector: row.vector};
+        }
+    });
+    let requeued = false;
+    Object.keys(previous).forEach(id => {
+        if (!(id in syncState.rows) && !(id in syncState.pending)) {
+            syncState.pending[id] = {key: JSON.parse(id), value: previous[id].value, base: {}};
+            requeued = true;
+        }
+    });
+    // After a server restart the old vectors mean nothing: rebase pending edits on the rows received
+    if (result.reset) {
+        Object.values(syncState.pending).forEach(change => {
+            const row = syncState.rows[rowId(change.key)];
+            change.base = row ? row.vector : {};
+        });
+    }
+    syncState.token = result.token;
+    storeSyncState();
+    return requeued;
+}
+
 // Save profile data
 function saveProfile() {
     const name = document.getElementById('name').value;
@@ -155,16 +321,15 @@ function saveProfile() {
         lifeAreas.push(area.textContent);
     });
     
-    // Create user data object
-    const userData = {
+    // Queue the changed fields locally, then send them if online
+    queueProfile({
         name: name,
         job: job,
         hobbies: selectedHobbies,
-        lifeAreas: lifeAreas
-    };
-    
-    // Save to localStorage
-    localStorage.setItem('handyUserData', JSON.stringify(userData));
+        life_area_priority: lifeAreas
+    });
+    storeSyncState();
+    syncNow();
     
     // Show success message
     alert('Profile saved successfully!');
@@ -173,31 +338,46 @@ function saveProfile() {
     navigateTo('goals');
 }
 
-// Load user data from localStorage
+// Load user data from the local copy, then bring it up to date
 function loadUserData() {
-    const userDataString = localStorage.getItem('handyUserData');
-    if (userDataString) {
-        const userData = JSON.parse(userDataString);
-        
-        // Fill profile form
-        if (document.getElementById('name')) {
-            document.getElementById('name').value = userData.name || '';
-        }
-        
-        if (document.getElementById('job')) {
-            document.getElementById('job').value = userData.job || '';
+    loadSyncState();
+    renderProfile();
+    syncNow();
+    window.addEventListener('online', syncNow);
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'visible') {
+            syncNow();
         }
-        
-        // Select hobbies
-        if (userData.hobbies) {
-            document.querySelectorAll('.hobby-item').forEach(hobby => {
-                if (userData.hobbies.includes(hobby.textContent)) {
-                    hobby.classList.add('selected');
-                }
-            });
-        }
-        
-        // Update life areas order (more complex, would need to rebuild the list)
+    });
+}
+
+// Fill the profile form from the rows
+function renderProfile() {
+    if (document.getElementById('name')) {
+        document.getElementById('name').value = rowValue(['profile', 'name']) || '';
+    }
+    
+    if (document.getElementById('job')) {
+        document.getElementById('job').value = rowValue(['profile', 'job']) || '';
+    }
+    
+    // Select hobbies
+    const hobbies = rowValue(['profile', 'hobbies']) || [];
+    document.querySelectorAll('.hobby-item').forEach(hobby => {
+        hobby.classList.toggle('selected', hobbies.includes(hobby.textContent));
+    });
+    
+    // Reorder life areas
+    const priority = rowValue(['profile', 'life_area_priority']) || [];
+    const list = document.getElementById('life-areas');
+    if (list) {
+        const items = Array.from(list.querySelectorAll('.sortable-item'));
+        priority.forEach(area => {
+            const item = items.find(i => i.textContent === area);
+            if (item) {
+                list.appendChild(item);
+            }
+        });
     }
 }
 